@@ -1,9 +1,17 @@
 from pkg_resources import resource_string
 from enum import Enum
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 import numpy as np
-from astropy.io import fits
 import numbers
+import heapq
+from functools import partial
+from operator import attrgetter
+import os
+import threading
+import multiprocessing
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 
 # Beware:
 #     for some reason rawzfits needs to be imported before
@@ -12,8 +20,23 @@ from . import rawzfits
 # If you would like to learn more about the contents of the compiled
 # rawzfits extension. Please have a look into protozfits/rawzfits.pyx
 from google.protobuf.reflection import GeneratedProtocolMessageType
+from google.protobuf.descriptor import FieldDescriptor
 from .CoreMessages_pb2 import AnyArray
-from .any_array_to_numpy import any_array_to_numpy
+from .any_array_to_numpy import any_array_to_numpy, empty_array
+from .fits_header import read_headers
+from .metadata_cache import MetadataCache
+from .file_pool import FilePool
+from .waveforms import (
+    dense_waveforms,
+    dense_integrals,
+    stack_dense_waveforms,
+    stack_dense_integrals,
+    reshape_waveform,
+    pixel_order,
+    take_pixels,
+    reorder_waveform,
+)
+from .lstcam import decode_lstcam
 
 
 from . import L0_pb2
@@ -28,6 +51,13 @@ __all__ = [
     'File',
     'make_namedtuple',
     'any_array_to_numpy',
+    'dense_waveforms',
+    'dense_integrals',
+    'stack_dense_waveforms',
+    'stack_dense_integrals',
+    'decode_lstcam',
+    'MetadataCache',
+    'FilePool',
 ]
 
 pb2_modules = {
@@ -47,15 +77,97 @@ def get_class_from_PBFHEAD(pbfhead):
 
 class File:
 
-    def __init__(self, path, pure_protobuf=False):
-        bintable_descriptions = detect_bintables(path)
-        for btd in bintable_descriptions:
-            self.__dict__[btd.extname] = Table(btd, pure_protobuf)
+    def __init__(
+        self,
+        path,
+        pure_protobuf=False,
+        fields=None,
+        lazy=False,
+        reshape_waveforms=False,
+        reorder_pixels=False,
+        metadata_cache=None,
+    ):
+        '''
+        fields: only convert these (dotted) fields of the rows,
+            e.g. ['event_id', 'lstcam.first_capacitor_id'].
+            A list applies to the `Events` table, a dict maps table
+            names to lists of fields.
+        lazy: return rows which convert their fields only on first access
+        reshape_waveforms: return the `waveform` of the `Events` as
+            (n_gains, n_pixels, n_samples) view, using `num_pixels` and
+            `num_samples` from the run header.
+        reorder_pixels: sort the per pixel arrays of the `Events` by pixel
+            id, using `expected_pixels_id` from the run header.
+        metadata_cache: optional MetadataCache, to look up the tables
+            of the file in, instead of scanning its headers.
+        '''
+        self.closed = False
+        if fields is not None and not isinstance(fields, dict):
+            fields = {'Events': fields}
+        self.__fields = fields or {}
+        self.__pure_protobuf = pure_protobuf
+        self.__lazy = lazy
+        self.__reshape_waveforms = reshape_waveforms
+        self.__reorder_pixels = reorder_pixels
+
+        # the Tables are only created when they are accessed
+        self.__bintable_descriptions = OrderedDict(
+            (btd.extname, btd)
+            for btd in cached_detect_bintables(path, metadata_cache)
+        )
+        # but unknown fields should be reported right away
+        for name, table_fields in self.__fields.items():
+            if name in self.__bintable_descriptions:
+                make_field_tree(
+                    get_class_from_PBFHEAD(
+                        self.__bintable_descriptions[name].pbfhead
+                    ),
+                    table_fields,
+                )
+
+    def __getattr__(self, name):
+        # only called for attributes, which are not set yet
+        descriptions = self.__dict__.get('_File__bintable_descriptions', {})
+        if name not in descriptions:
+            raise AttributeError(
+                '{!r} object has no attribute {!r}'.format(
+                    self.__class__.__name__, name
+                )
+            )
+        if self.closed:
+            raise ValueError('I/O operation on closed File')
+        transforms = None
+        if name == 'Events':
+            transforms = make_event_transforms(
+                list(descriptions.values()),
+                self.__reshape_waveforms,
+                self.__reorder_pixels,
+            )
+        table = Table(
+            descriptions[name],
+            self.__pure_protobuf,
+            self.__fields.get(name),
+            self.__lazy,
+            transforms,
+        )
+        self.__dict__[name] = table
+        return table
+
+    def __dir__(self):
+        return list(super().__dir__()) + list(self.__bintable_descriptions)
+
+    @property
+    def tables(self):
+        '''OrderedDict of all tables by name'''
+        return OrderedDict(
+            (name, getattr(self, name))
+            for name in self.__bintable_descriptions
+        )
 
     def __repr__(self):
         return "%s(%r)" % (
             self.__class__.__name__,
-            self.__dict__
+            dict(self.tables)
         )
 
     def __enter__(self):
@@ -65,10 +177,11 @@ class File:
         self.close()
 
     def close(self):
-        pass
-
-    def __del__(self):
-        self.close()
+        '''close all tables opened so far, no tables can be opened after'''
+        for name in self.__dict__.get('_File__bintable_descriptions', {}):
+            if name in self.__dict__:
+                self.__dict__[name].close()
+        self.closed = True
 
 
 BinTableDescription = namedtuple(
@@ -84,40 +197,244 @@ BinTableDescription = namedtuple(
 )
 
 
+# names of the tables holding the run header, R1 and L0 respectively
+run_header_extnames = ('CameraConfig', 'RunHeader')
+
+
+def read_run_header(bintable_descriptions):
+    '''read the run header of a file as protobuf message'''
+    for btd in bintable_descriptions:
+        if btd.extname in run_header_extnames:
+            with Table(btd, pure_protobuf=True) as table:
+                return table[0]
+    raise ValueError('no run header table ({}) found'.format(
+        ', '.join(run_header_extnames)
+    ))
+
+
+# per pixel fields of the events, which are sorted by reorder_pixels
+per_pixel_fields = [
+    'pixel_status',
+    'nectarcam.charges_gain1',
+    'nectarcam.charges_gain2',
+]
+
+
+def make_event_transforms(
+    bintable_descriptions,
+    reshape_waveforms=False,
+    reorder_pixels=False,
+):
+    '''Table transforms for the events of a file, see File'''
+    if not (reshape_waveforms or reorder_pixels):
+        return {}
+
+    run_header = read_run_header(bintable_descriptions)
+    n_pixels = run_header.num_pixels
+    n_samples = run_header.num_samples
+    if not (n_pixels and n_samples):
+        raise ValueError(
+            'run header of {} does not define num_pixels and '
+            'num_samples'.format(bintable_descriptions[0].path)
+        )
+
+    if not reorder_pixels:
+        return {
+            'waveform': partial(
+                reshape_waveform,
+                n_pixels=n_pixels,
+                n_samples=n_samples,
+            )
+        }
+
+    order = pixel_order(any_array_to_numpy(run_header.expected_pixels_id))
+    transforms = {
+        field: partial(take_pixels, order=order)
+        for field in per_pixel_fields
+    }
+    transforms['waveform'] = partial(
+        reorder_waveform,
+        order=order,
+        n_pixels=n_pixels,
+        n_samples=n_samples,
+        reshape=reshape_waveforms,
+    )
+    return transforms
+
+
+def cached_detect_bintables(path, metadata_cache=None):
+    '''detect_bintables, using metadata_cache if it is not None'''
+    if metadata_cache is None:
+        return detect_bintables(path)
+    return metadata_cache.detect_bintables(path)
+
+
 def detect_bintables(path):
-    fitsfile = fits.open(path)
+    # the header is kept as string, Table.header parses it when needed
     bintables = [
         BinTableDescription(
             path=path,
             index=hdu_id,
-            extname=hdu.header['EXTNAME'],
-            pbfhead=hdu.header['PBFHEAD'],
-            znaxis2=hdu.header['ZNAXIS2'],
-            header=hdu.header
+            extname=cards['EXTNAME'],
+            pbfhead=cards['PBFHEAD'],
+            znaxis2=cards['ZNAXIS2'],
+            header=header
         )
-        for hdu_id, hdu in enumerate(fitsfile)
-        if 'XTENSION' in hdu.header and hdu.header['XTENSION'] == 'BINTABLE'
+        for hdu_id, (header, cards) in enumerate(read_headers(path))
+        if cards.get('XTENSION') == 'BINTABLE'
     ]
-    fitsfile.close()
     return bintables
 
 
+# The prebuilt rawzfits binaries shipped in this package predate some
+# methods of rawzfits.pyx, e.g. the *_view methods. These helpers use the
+# newer methods when the reader has them and fall back to the old ones.
+def _parse_next_row(protobuf_i_fits, row):
+    '''parse the next row of the reader into the message `row`'''
+    read_event_view = getattr(protobuf_i_fits, 'read_event_view', None)
+    if read_event_view is None:
+        row.ParseFromString(protobuf_i_fits.read_event())
+        return
+    with read_event_view() as buffer:
+        row.ParseFromString(buffer)
+
+
+def _parse_given_row(protobuf_i_fits, event_id, row):
+    '''parse row `event_id` (counting from 1) into the message `row`'''
+    read_view = getattr(protobuf_i_fits, 'read_a_given_event_view', None)
+    if read_view is None:
+        row.ParseFromString(protobuf_i_fits.read_a_given_event(event_id))
+        return
+    with read_view(event_id) as buffer:
+        row.ParseFromString(buffer)
+
+
+def _read_events(protobuf_i_fits, start, count):
+    '''(buffer, offsets) of up to `count` rows from row `start` on,
+    counting from 1, see rawzfits.ProtobufIFits.read_events
+    '''
+    read_events = getattr(protobuf_i_fits, 'read_events', None)
+    if read_events is not None:
+        return read_events(start, count)
+    stop = min(start + count, protobuf_i_fits.num_rows() + 1)
+    if start >= stop:
+        raise StopIteration
+    return _join_rows([
+        protobuf_i_fits.read_a_given_event(event_id)
+        for event_id in range(start, stop)
+    ])
+
+
+def _read_next_events(protobuf_i_fits, count):
+    '''like _read_events, continuing after the last row read'''
+    if hasattr(protobuf_i_fits, 'read_events'):
+        return protobuf_i_fits.read_events(
+            protobuf_i_fits.n_events + 1,
+            count
+        )
+    rows = []
+    for _ in range(count):
+        try:
+            rows.append(protobuf_i_fits.read_event())
+        except StopIteration:
+            break
+    if not rows:
+        raise StopIteration
+    return _join_rows(rows)
+
+
+def _join_rows(rows):
+    offsets = np.zeros(len(rows) + 1, dtype=np.uint64)
+    np.cumsum([len(row) for row in rows], out=offsets[1:])
+    return b''.join(rows), offsets
+
+
+def _close_reader(protobuf_i_fits):
+    '''free the reader now, or when it is collected if it can not close'''
+    close = getattr(protobuf_i_fits, 'close', None)
+    if close is not None:
+        close()
+
+
 class Table:
     '''Iterable Table
     '''
 
-    def __init__(self, desc, pure_protobuf=False):
+    def __init__(
+        self,
+        desc,
+        pure_protobuf=False,
+        fields=None,
+        lazy=False,
+        transforms=None,
+    ):
         '''
         desc: BinTableDescription
+        fields: list of (dotted) fields to convert, None converts all
+        lazy: return LazyMessages instead of namedtuples
+        transforms: dict mapping (dotted) field names to functions applied
+            to the converted values, see `converter`
         '''
         self.__desc = desc
-        self.protobuf_i_fits = rawzfits.ProtobufIFits(
-            self.__desc.path,
-            self.__desc.extname
-        )
+        self.__protobuf_i_fits = None
+        self.closed = False
         self.__pbuf_class = get_class_from_PBFHEAD(desc.pbfhead)
-        self.header = self.__desc.header
+        self.__header = None
         self.pure_protobuf = pure_protobuf
+        self.fields = fields
+        self.lazy = lazy
+        self.transforms = transforms or {}
+        self.__field_tree = None
+        if fields is not None:
+            self.__field_tree = make_field_tree(self.__pbuf_class, fields)
+        if lazy:
+            self.__convert = lazy_class(
+                self.__pbuf_class,
+                self.__field_tree,
+                self.transforms
+            )
+        else:
+            self.__convert = converter(
+                self.__pbuf_class,
+                self.__field_tree,
+                self.transforms
+            )
+
+    @property
+    def protobuf_i_fits(self):
+        '''the reader of the table, opened on first use'''
+        self.__check_open()
+        if self.__protobuf_i_fits is None:
+            self.__protobuf_i_fits = rawzfits.ProtobufIFits(
+                self.__desc.path,
+                self.__desc.extname
+            )
+        return self.__protobuf_i_fits
+
+    def close(self):
+        '''free the reader, reading rows afterwards raises a ValueError'''
+        if self.__protobuf_i_fits is not None:
+            _close_reader(self.__protobuf_i_fits)
+            self.__protobuf_i_fits = None
+        self.closed = True
+
+    def __check_open(self):
+        if self.closed:
+            raise ValueError('I/O operation on closed Table')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        self.close()
+
+    @property
+    def header(self):
+        '''the FITS header of the table, as astropy Header'''
+        if self.__header is None:
+            from astropy.io import fits
+            self.__header = fits.Header.fromstring(self.__desc.header)
+        return self.__header
 
     def __len__(self):
         return self.__desc.znaxis2
@@ -128,14 +445,200 @@ class Table:
 
     def __next__(self):
         row = self.__pbuf_class()
-        row.ParseFromString(self.protobuf_i_fits.read_event())
+        _parse_next_row(self.protobuf_i_fits, row)
         return self.convert(row)
 
+    def read_batch(self, n):
+        '''read the next `n` rows with a single call into rawzfits
+
+        returns a list of at most `n` rows, the list is empty once the
+        table is exhausted.
+        '''
+        if n < 1:
+            raise ValueError('n must be at least 1, got {}'.format(n))
+        try:
+            batch = _read_next_events(self.protobuf_i_fits, n)
+        except StopIteration:
+            return []
+
+        return [self.convert(row) for row in self.__parse_batch(*batch)]
+
+    def to_columns(self, fields, batch_size=100):
+        '''read some (dotted) fields of all rows into numpy arrays
+
+        e.g. table.to_columns(['event_id', 'lstcam.first_capacitor_id'])
+
+        returns a dict with one array per field, holding one entry per row.
+        Scalar fields become 1D arrays, AnyArrays of fixed size are
+        stacked into 2D arrays.
+        This works directly on the protobuf messages, no namedtuples
+        are created.
+        The type of an AnyArray is only stored in the rows, so for an
+        empty table AnyArray columns are (0, 0) arrays of the dtype of an
+        empty AnyArray.
+        '''
+        paths = [field.split('.') for field in fields]
+        dtypes = [_field_dtype(self.__pbuf_class, path) for path in paths]
+        transforms = [self.transforms.get(field) for field in fields]
+        columns = [
+            np.empty(0, dtype) if dtype is not None
+            else np.empty((0, 0), empty_array.dtype)
+            for dtype in dtypes
+        ]
+        for i, message in enumerate(self.iter_messages(batch_size)):
+            values = [
+                _get_field(message, path, transform)
+                for path, transform in zip(paths, transforms)
+            ]
+            if i == 0:
+                columns = [
+                    np.empty(
+                        (len(self), ) + np.shape(value),
+                        dtype if dtype is not None else value.dtype
+                    )
+                    for dtype, value in zip(dtypes, values)
+                ]
+            for field, column, value in zip(fields, columns, values):
+                if np.shape(value) != column.shape[1:]:
+                    raise ValueError(
+                        'field {} of row {} has shape {}, expected {}'.format(
+                            field, i, np.shape(value), column.shape[1:]
+                        )
+                    )
+                column[i] = value
+
+        return dict(zip(fields, columns))
+
+    def iter_messages(self, batch_size=100):
+        '''iterate over all rows as plain protobuf messages
+
+        The rows are read in batches of `batch_size` and never converted,
+        which makes this the fastest way to look at every row.
+        This uses a reader of its own, so it can be used while iterating
+        over the table.
+        '''
+        self.__check_open()
+        return self.__iter_messages(batch_size)
+
+    def __iter_messages(self, batch_size):
+        protobuf_i_fits = rawzfits.ProtobufIFits(
+            self.__desc.path,
+            self.__desc.extname
+        )
+        try:
+            start = 1
+            while True:
+                try:
+                    batch = _read_events(protobuf_i_fits, start, batch_size)
+                except StopIteration:
+                    return
+                yield from self.__parse_batch(*batch)
+                start += len(batch[1]) - 1
+        finally:
+            _close_reader(protobuf_i_fits)
+
+    def __parse_batch(self, buffer, offsets):
+        buffer = memoryview(buffer)
+        offsets = offsets.tolist()
+        for start, stop in zip(offsets[:-1], offsets[1:]):
+            row = self.__pbuf_class()
+            row.ParseFromString(buffer[start:stop])
+            yield row
+
+    def iter_prefetch(self, depth=16, workers=2):
+        '''iterate over all rows, reading and converting ahead in threads
+
+        Up to `depth` rows are read, parsed and converted ahead of the
+        consumer by `workers` threads, each of which opens its own reader.
+        The rows are returned in order.
+        '''
+        self.__check_open()
+        if depth < 1 or workers < 1:
+            raise ValueError(
+                'depth and workers must be at least 1, got {} and {}'.format(
+                    depth, workers
+                )
+            )
+        return self.__iter_prefetch(depth, workers)
+
+    def __iter_prefetch(self, depth, workers):
+        local = threading.local()
+        readers = []
+
+        def read(index):
+            if not hasattr(local, 'protobuf_i_fits'):
+                local.protobuf_i_fits = rawzfits.ProtobufIFits(
+                    self.__desc.path,
+                    self.__desc.extname
+                )
+                readers.append(local.protobuf_i_fits)
+            return self.__read_a_given_event_from(local.protobuf_i_fits, index)
+
+        indices = iter(range(len(self)))
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pending = deque(
+                    executor.submit(read, index)
+                    for index in islice(indices, depth)
+                )
+                try:
+                    while pending:
+                        row = pending.popleft().result()
+                        for index in islice(indices, 1):
+                            pending.append(executor.submit(read, index))
+                        yield row
+                finally:
+                    for future in pending:
+                        future.cancel()
+        finally:
+            # the workers are done, their readers can go
+            for reader in readers:
+                _close_reader(reader)
+
+    def parallel_map(self, func, processes=None, chunksize=None):
+        '''apply `func` to every row, using a pool of worker processes
+
+        The rows are split into chunks of `chunksize` rows. Every worker
+        process opens the table once and then converts one chunk after
+        the other. The results are yielded in row order.
+
+        `func` and its return values have to be picklable, so `func`
+        should be defined at module level and return e.g. numbers or
+        numpy arrays rather than the rows themselves.
+        '''
+        processes = processes or os.cpu_count()
+        if chunksize is None:
+            chunksize = max(1, -(-len(self) // (4 * processes)))
+
+        chunks = [
+            (start, min(start + chunksize, len(self)))
+            for start in range(0, len(self), chunksize)
+        ]
+        with multiprocessing.Pool(
+            processes,
+            initializer=_init_map_worker,
+            initargs=(self, func),
+        ) as pool:
+            for results in pool.imap(_map_rows, chunks):
+                yield from results
+
+    def __reduce__(self):
+        # worker processes open the file again instead of pickling readers
+        return (
+            self.__class__,
+            (
+                self.__desc,
+                self.pure_protobuf,
+                self.fields,
+                self.lazy,
+                self.transforms,
+            )
+        )
+
     def convert(self, row):
-        if not self.pure_protobuf:
-            return make_namedtuple(row)
-        else:
+        if self.pure_protobuf:
             return row
+        return self.__convert(row)
 
     def __repr__(self):
         return '{cn}({d.znaxis2}x{d.pbfhead})'.format(
@@ -167,33 +670,244 @@ class Table:
         ''' return a given event id
         id starting at 0 not at 1
         '''
+        return self.__read_a_given_event_from(self.protobuf_i_fits, index)
+
+    def __read_a_given_event_from(self, protobuf_i_fits, index):
         row = self.__pbuf_class()
-        row.ParseFromString(
-            # counting starts at one, so we add 1
-            self.protobuf_i_fits.read_a_given_event(index + 1)
-        )
+        # counting starts at one, so we add 1
+        _parse_given_row(protobuf_i_fits, index + 1, row)
         return self.convert(row)
 
 
-def make_namedtuple(message):
-    namedtuple_class = named_tuples[message.__class__]
-    return namedtuple_class._make(
-        message_getitem(message, name)
-        for name in namedtuple_class._fields
-    )
+# the table and function of a parallel_map worker process
+_map_worker = {}
+
+
+def _init_map_worker(table, func):
+    _map_worker['table'] = table
+    _map_worker['func'] = func
+
+
+def _map_rows(chunk):
+    start, stop = chunk
+    func = _map_worker['func']
+    return [func(row) for row in _map_worker['table'][start:stop]]
+
+
+scalar_field_dtypes = {
+    FieldDescriptor.CPPTYPE_INT32: np.int32,
+    FieldDescriptor.CPPTYPE_INT64: np.int64,
+    FieldDescriptor.CPPTYPE_UINT32: np.uint32,
+    FieldDescriptor.CPPTYPE_UINT64: np.uint64,
+    FieldDescriptor.CPPTYPE_DOUBLE: np.float64,
+    FieldDescriptor.CPPTYPE_FLOAT: np.float32,
+    FieldDescriptor.CPPTYPE_BOOL: np.bool_,
+    FieldDescriptor.CPPTYPE_ENUM: np.int32,
+}
+
+
+def _field_dtype(message_class, path):
+    '''numpy dtype of a column, None means: use the dtype of the AnyArray'''
+    descriptor = message_class.DESCRIPTOR
+    field = None
+    for name in path:
+        if field is not None:
+            if field.message_type is None:
+                raise ValueError('{} has no field {!r}'.format(
+                    field.full_name, name
+                ))
+            descriptor = field.message_type
+        if name not in descriptor.fields_by_name:
+            raise ValueError('{} has no field {!r}'.format(
+                descriptor.full_name, name
+            ))
+        field = descriptor.fields_by_name[name]
+    if field.label == FieldDescriptor.LABEL_REPEATED:
+        raise ValueError('repeated field {} cannot be a column'.format(
+            '.'.join(path)
+        ))
+    if field.message_type is not None:
+        if field.message_type.name != 'AnyArray':
+            raise ValueError('field {} is a message, not a column'.format(
+                '.'.join(path)
+            ))
+        return None
+    return scalar_field_dtypes.get(field.cpp_type, object)
+
+
+def _get_field(message, path, transform=None):
+    for name in path:
+        message = getattr(message, name)
+    if isinstance(message, AnyArray):
+        message = any_array_to_numpy(message)
+    if transform is not None:
+        message = transform(message)
+    return message
+
 
+def make_namedtuple(message, field_tree=None):
+    '''convert a protobuf message into a namedtuple
 
-def message_getitem(msg, name):
+    field_tree: as returned by make_field_tree, restricts the conversion
+        to some fields. None converts all fields.
+    '''
+    return converter(message.__class__, field_tree)(message)
+
+
+def message_getitem(msg, name, field_tree=None):
     value = msg.__getattribute__(name)
     if isinstance(value, AnyArray):
         value = any_array_to_numpy(value)
     elif (msg.__class__, name) in enum_types:
         value = enum_types[(msg.__class__, name)](value)
     elif type(value) in named_tuples:
-        value = make_namedtuple(value)
+        value = make_namedtuple(value, field_tree)
     return value
 
 
+converters = {}
+
+
+def converter(m, field_tree=None, transforms=None):
+    '''function converting messages of type m into namedtuples
+
+    The kind of each field (AnyArray, enum, message or plain value) is
+    looked up once, when the converter is built, instead of being probed
+    for every field of every message like in message_getitem.
+
+    transforms: dict mapping (dotted) field names to functions, which are
+        applied to the converted values, e.g. to reshape arrays.
+        Converters with transforms are not cached.
+    '''
+    if transforms:
+        return _build_converter(m, field_tree, transforms)
+    key = (m, field_tree)
+    if key not in converters:
+        converters[key] = _build_converter(m, field_tree)
+    return converters[key]
+
+
+def _build_converter(m, field_tree=None, transforms=None):
+    if field_tree is None:
+        namedtuple_class = named_tuples[m]
+        field_tree = tuple(
+            (name, None) for name in namedtuple_class._fields
+        )
+    else:
+        namedtuple_class = projected_nt(m, field_tree)
+    getters = [
+        field_converter(m, name, subtree, transforms=transforms)
+        for name, subtree in field_tree
+    ]
+    make = namedtuple_class._make
+
+    def convert(message):
+        return make([getter(message) for getter in getters])
+
+    return convert
+
+
+def field_converter(m, name, field_tree=None, lazy=False, transforms=None):
+    '''function converting the field `name` of messages of type m
+
+    lazy: wrap sub-messages into LazyMessages instead of namedtuples
+    transforms: as in converter
+    '''
+    getter = _field_getter(
+        m,
+        name,
+        field_tree,
+        lazy,
+        sub_transforms(transforms, name)
+    )
+    if transforms and name in transforms:
+        transform = transforms[name]
+        return lambda message: transform(getter(message))
+    return getter
+
+
+def _field_getter(m, name, field_tree, lazy, transforms):
+    get = attrgetter(name)
+    field = m.DESCRIPTOR.fields_by_name[name]
+    if field.label == FieldDescriptor.LABEL_REPEATED:
+        return get
+
+    if field.message_type is not None:
+        full_name = field.message_type.full_name
+        if full_name == AnyArray.DESCRIPTOR.full_name:
+            return lambda message: any_array_to_numpy(get(message))
+        if full_name not in messages_by_name:
+            return get
+        if lazy:
+            wrap = lazy_class(
+                messages_by_name[full_name], field_tree, transforms
+            )
+        else:
+            wrap = converter(
+                messages_by_name[full_name], field_tree, transforms
+            )
+        return lambda message: wrap(get(message))
+
+    if (m, name) in enum_types:
+        enum = enum_types[(m, name)]
+        return lambda message: enum(get(message))
+    return get
+
+
+def sub_transforms(transforms, name):
+    '''the transforms of the fields inside the sub-message `name`'''
+    if not transforms:
+        return None
+    prefix = name + '.'
+    return {
+        path[len(prefix):]: transform
+        for path, transform in transforms.items()
+        if path.startswith(prefix)
+    }
+
+
+def make_field_tree(message_class, fields):
+    '''turn a list of dotted field names into a field tree
+
+    A field tree is a tuple of (name, subtree) pairs in the order of the
+    message definition, a subtree of None means the complete field.
+
+    >>> make_field_tree(R1_pb2.CameraEvent, ['lstcam.counters', 'event_id'])
+    (('event_id', None), ('lstcam', (('counters', None),)))
+    '''
+    descriptor = message_class.DESCRIPTOR
+    subfields = {}
+    for field in fields:
+        name, _, rest = field.partition('.')
+        if name not in descriptor.fields_by_name:
+            raise ValueError('{} has no field {!r}'.format(
+                descriptor.full_name, name
+            ))
+        if not rest or subfields.get(name, []) is None:
+            subfields[name] = None
+        elif descriptor.fields_by_name[name].message_type is None:
+            raise ValueError('{}.{} has no field {!r}'.format(
+                descriptor.full_name, name, rest
+            ))
+        else:
+            subfields.setdefault(name, []).append(rest)
+
+    field_tree = []
+    for field in descriptor.fields:
+        if field.name not in subfields:
+            continue
+        subtree = subfields[field.name]
+        if subtree is not None:
+            full_name = field.message_type.full_name
+            if full_name not in messages_by_name:
+                # e.g. AnyArray, which cannot be projected
+                subtree = None
+            else:
+                subtree = make_field_tree(messages_by_name[full_name], subtree)
+        field_tree.append((field.name, subtree))
+    return tuple(field_tree)
+
+
 messages = set()
 for module in pb2_modules.values():
     for name in dir(module):
@@ -201,6 +915,8 @@ for module in pb2_modules.values():
         if isinstance(thing, GeneratedProtocolMessageType):
             messages.add(thing)
 
+messages_by_name = {m.DESCRIPTOR.full_name: m for m in messages}
+
 
 def namedtuple_repr2(self):
     '''a nicer repr for big namedtuples containing big numpy arrays'''
@@ -235,6 +951,107 @@ def nt(m):
 
 named_tuples = {m: nt(m) for m in messages}
 
+projected_named_tuples = {}
+
+
+def projected_nt(m, field_tree):
+    '''namedtuple class holding only the fields in field_tree'''
+    names = tuple(name for name, subtree in field_tree)
+    if (m, names) not in projected_named_tuples:
+        _nt = namedtuple(m.__name__, names)
+        _nt.__repr__ = namedtuple_repr2
+        projected_named_tuples[(m, names)] = _nt
+    return projected_named_tuples[(m, names)]
+
+
+class LazyMessage:
+    '''namedtuple-like wrapper around a protobuf message
+
+    Fields are converted like in make_namedtuple, but only when they are
+    accessed for the first time. The converted value is then stored in
+    the instance, so later accesses are plain attribute lookups.
+    '''
+    _fields = ()
+
+    def __init__(self, message):
+        self._message = message
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(getattr(self, name) for name in self._fields[index])
+        return getattr(self, self._fields[index])
+
+    def _asdict(self):
+        return OrderedDict(zip(self._fields, self))
+
+    __repr__ = namedtuple_repr2
+
+
+class lazy_field:
+    '''descriptor converting a message field on first access'''
+
+    def __init__(self, name, convert):
+        self.name = name
+        self.convert = convert
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = self.convert(instance._message)
+        # from now on the instance attribute hides this descriptor
+        instance.__dict__[self.name] = value
+        return value
+
+
+lazy_classes = {}
+
+
+def lazy_class(m, field_tree=None, transforms=None):
+    '''LazyMessage subclass for messages of type m
+
+    transforms: as in converter
+    '''
+    if transforms:
+        return _build_lazy_class(m, field_tree, transforms)
+    key = (m, field_tree)
+    if key not in lazy_classes:
+        lazy_classes[key] = _build_lazy_class(m, field_tree)
+    return lazy_classes[key]
+
+
+def _build_lazy_class(m, field_tree=None, transforms=None):
+    if field_tree is None:
+        field_tree = tuple(
+            (name, None)
+            for name in m.DESCRIPTOR.fields_by_name
+        )
+    namespace = {
+        name: lazy_field(
+            name,
+            field_converter(
+                m, name, subtree, lazy=True, transforms=transforms
+            )
+        )
+        for name, subtree in field_tree
+    }
+    namespace['_fields'] = tuple(name for name, subtree in field_tree)
+    return type(m.__name__, (LazyMessage, ), namespace)
+
+
+def make_lazy(message, field_tree=None):
+    '''wrap a protobuf message into a LazyMessage
+
+    field_tree: as in make_namedtuple
+    '''
+    return lazy_class(message.__class__, field_tree)(message)
+
+
 enum_types = {}
 for m in messages:
     d = m.DESCRIPTOR
@@ -248,6 +1065,45 @@ for m in messages:
             enum_types[(m, field.name)] = enum
 
 
+def event_key(key):
+    '''function of an event for MultiZFitsFiles(key=...)'''
+    if callable(key):
+        return key
+    if isinstance(key, str):
+        return attrgetter(key)
+    return attrgetter(*key)
+
+
+# MultiZFitsFiles scans the headers of more files than this in threads
+parallel_open_threshold = 4
+
+
+def event_table_description(path, metadata_cache=None):
+    '''the BinTableDescription of the Events table of a file'''
+    for desc in cached_detect_bintables(path, metadata_cache):
+        if desc.extname == 'Events':
+            return desc
+    raise ValueError('{} has no Events table'.format(path))
+
+
+def open_event_descriptions(paths, metadata_cache=None):
+    '''event_table_description of many files, in parallel if there are many'''
+    describe = partial(event_table_description, metadata_cache=metadata_cache)
+    if len(paths) <= parallel_open_threshold:
+        return [describe(path) for path in paths]
+    with ThreadPoolExecutor() as executor:
+        return list(executor.map(describe, paths))
+
+
+def key_fields(key):
+    '''the field names of a MultiZFitsFiles key, None for functions'''
+    if callable(key):
+        return None
+    if isinstance(key, str):
+        return (key, )
+    return tuple(key)
+
+
 class MultiZFitsFiles:
     '''
     In LST they have multiple file writers, which save the incoming events
@@ -262,33 +1118,83 @@ class MultiZFitsFiles:
     The task of MultiZFitsFiles is to open these 4 files simultaneously
     and return the events in the correct order, so the user does not really
     have to know about these existence of 4 files.
+
+    key: what defines the order, the name of a field of the events,
+        a tuple of field names like ('trigger_time_s', 'trigger_time_qns')
+        or a function of the event. Events with equal keys are returned
+        in the order of `paths`.
+    index_path: optional path of a file to store the index used by
+        `multi[i]` in. It is rebuilt when the files have changed.
+    prefetch: if > 0, every file gets its own reader thread, which reads
+        and converts up to `prefetch` events ahead (see Table.iter_prefetch),
+        while the merge runs in the consuming thread.
+    metadata_cache: optional MetadataCache, see File.
+
+    Besides iterating, the merged events can be accessed like the rows of a
+    Table: multi[i], multi[start:stop] or multi[[i, j, k]]. This needs
+    an index, which is built on first use from the key columns of the
+    files, assuming the events of every file are sorted by key.
     '''
 
-    def __init__(self, paths):
-        self._event_tables = {}
-        self._events = {}
-        __headers = {}
+    def __init__(
+        self,
+        paths,
+        key='event_id',
+        index_path=None,
+        prefetch=0,
+        metadata_cache=None,
+    ):
+        self._paths = list(paths)
+        self._key = event_key(key)
+        self._key_fields = key_fields(key)
+        self._index_path = index_path
+        self._index = None
+        self._access_tables = None
+        self._event_descs = open_event_descriptions(
+            self._paths, metadata_cache
+        )
+        self._event_tables = []
+        self._streams = []
+        self._heap = []
+        self._headers = None
+
+        for index, desc in enumerate(self._event_descs):
+            self._event_tables.append(Table(desc))
+            if prefetch > 0:
+                self._streams.append(
+                    self._event_tables[index].iter_prefetch(
+                        depth=prefetch, workers=1
+                    )
+                )
+            else:
+                self._streams.append(self._event_tables[index])
 
-        for path in paths:
-            self._event_tables[path] = File(path).Events
-            __headers[path] = File(path).Events.header
+        for index, stream in enumerate(self._streams):
             try:
-                self._events[path] = next(self._event_tables[path])
+                event = next(stream)
             except StopIteration:
-                pass
+                continue
+            self._heap.append((self._key(event), index, event))
+        heapq.heapify(self._heap)
 
-        self.headers = {}
-        for path, h in __headers.items():
-            for key in h.keys():
-                if key not in self.headers:
-                    self.headers[key] = {}
+    @property
+    def headers(self):
+        '''dict mapping header keywords to a dict of path: value'''
+        if self._headers is None:
+            self._headers = {}
+            for path, table in zip(self._paths, self._event_tables):
+                h = table.header
+                for key in h.keys():
+                    if key not in self._headers:
+                        self._headers[key] = {}
 
-                self.headers[key][path] = h[key]
+                    self._headers[key][path] = h[key]
+        return self._headers
 
     def __len__(self):
         total_length = sum(
             len(table)
-            for table in self._event_tables.values()
+            for table in self._event_tables
         )
         return total_length
 
@@ -298,22 +1204,131 @@ class MultiZFitsFiles:
     def __next__(self):
         return self.next_event()
 
+    def __getitem__(self, item):
+        # like Table.__getitem__: numbers, slices or iterables of numbers
+        if isinstance(item, numbers.Integral):
+            return self.__read_a_given_event(item)
+        elif isinstance(item, slice):
+            def inner():
+                for index in range(*item.indices(len(self))):
+                    yield self.__read_a_given_event(index)
+            return inner()
+        else:
+            def inner():
+                for index in item:
+                    yield self.__read_a_given_event(index)
+            return inner()
+
+    @property
+    def index(self):
+        '''(stream, row) of all events in merged order, as two arrays
+
+        stream is the position of the file in `paths`.
+        '''
+        if self._index is None:
+            self._index = self.__load_index()
+            if self._index is None:
+                self._index = self.__build_index()
+                if self._index_path is not None:
+                    self.__save_index(self._index)
+        return self._index
+
+    def __read_a_given_event(self, index):
+        streams, rows = self.index
+        if index < 0:
+            index += len(streams)
+        if not 0 <= index < len(streams):
+            raise IndexError('event {} out of range'.format(index))
+        tables = self.__get_access_tables()
+        return tables[streams[index]][int(rows[index])]
+
+    def __get_access_tables(self):
+        # separate readers, so random access does not disturb iteration
+        if self._access_tables is None:
+            self._access_tables = [
+                Table(desc) for desc in self._event_descs
+            ]
+        return self._access_tables
+
+    def __build_index(self):
+        streams, rows, keys = [], [], []
+        for stream, table in enumerate(self.__get_access_tables()):
+            streams.append(np.full(len(table), stream, dtype=np.int64))
+            rows.append(np.arange(len(table), dtype=np.int64))
+            if self._key_fields is not None:
+                columns = table.to_columns(self._key_fields)
+                keys.append([columns[f] for f in self._key_fields])
+            else:
+                keys.append([self._key(event) for event in table])
+        streams = np.concatenate(streams)
+        rows = np.concatenate(rows)
+
+        if self._key_fields is not None:
+            key_columns = [
+                np.concatenate([k[i] for k in keys])
+                for i in range(len(self._key_fields))
+            ]
+            # lexsort sorts by the last key first
+            order = np.lexsort([rows, streams] + key_columns[::-1])
+        else:
+            keys = [k for stream_keys in keys for k in stream_keys]
+            order = sorted(
+                range(len(keys)),
+                key=lambda i: (keys[i], streams[i], rows[i])
+            )
+        return streams[order], rows[order]
+
+    def __file_stats(self):
+        stats = [os.stat(path) for path in self._paths]
+        return (
+            np.array([os.path.abspath(path) for path in self._paths]),
+            np.array([stat.st_size for stat in stats], dtype=np.int64),
+            np.array([stat.st_mtime_ns for stat in stats], dtype=np.int64),
+        )
+
+    def __load_index(self):
+        if self._index_path is None or not os.path.exists(self._index_path):
+            return None
+        paths, sizes, mtimes = self.__file_stats()
+        with np.load(self._index_path, allow_pickle=False) as stored:
+            if (
+                stored['paths'].shape != paths.shape
+                or (stored['paths'] != paths).any()
+                or (stored['sizes'] != sizes).any()
+                or (stored['mtimes'] != mtimes).any()
+                or list(stored['key']) != list(self._key_fields or ())
+            ):
+                return None
+            return stored['streams'], stored['rows']
+
+    def __save_index(self, index):
+        if self._key_fields is None:
+            # a function as key cannot be compared with the stored one
+            return
+        paths, sizes, mtimes = self.__file_stats()
+        with open(self._index_path, 'wb') as f:
+            np.savez(
+                f,
+                streams=index[0],
+                rows=index[1],
+                paths=paths,
+                sizes=sizes,
+                mtimes=mtimes,
+                key=np.array(self._key_fields),
+            )
+
     def next_event(self):
-        # check for the minimal event id
-        if not self._events:
+        # the heap holds the next event of each file, smallest key first
+        if not self._heap:
             raise StopIteration
 
-        min_path = min(
-            self._events.items(),
-            key=lambda item: item[1].event_id,
-        )[0]
-
-        # return the minimal event id
-        next_event = self._events[min_path]
+        _, index, next_event = self._heap[0]
         try:
-            self._events[min_path] = next(self._event_tables[min_path])
+            event = next(self._streams[index])
         except StopIteration:
-            del self._events[min_path]
+            heapq.heappop(self._heap)
+        else:
+            heapq.heapreplace(self._heap, (self._key(event), index, event))
 
         return next_event
 
@@ -321,4 +1336,13 @@ class MultiZFitsFiles:
         return self
 
     def __exit__(self, type, value, tb):
-        del self._event_tables
+        self.close()
+
+    def close(self):
+        '''stop the reader threads and close all tables'''
+        for stream in self._streams:
+            if hasattr(stream, 'close'):
+                stream.close()
+        for table in self._event_tables + (self._access_tables or []):
+            table.close()
+        self._heap = []
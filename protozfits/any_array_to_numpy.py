@@ -1,25 +1,75 @@
+import zlib
 import numpy as np
 
 
-def any_array_to_numpy(any_array):
-    any_array_type_to_numpy_type = {
-        1: np.int8,
-        2: np.uint8,
-        3: np.int16,
-        4: np.uint16,
-        5: np.int32,
-        6: np.uint32,
-        7: np.int64,
-        8: np.uint64,
-        9: np.float32,
-        10: np.float64,
-    }
-    if any_array.type == 0:
+any_array_type_to_numpy_type = {
+    1: np.dtype(np.int8),
+    2: np.dtype(np.uint8),
+    3: np.dtype(np.int16),
+    4: np.dtype(np.uint16),
+    5: np.dtype(np.int32),
+    6: np.dtype(np.uint32),
+    7: np.dtype(np.int64),
+    8: np.dtype(np.uint64),
+    9: np.dtype(np.float32),
+    10: np.dtype(np.float64),
+}
+
+# all empty AnyArrays share this array, so it must not be modified
+empty_array = np.array([])
+empty_array.flags.writeable = False
+
+# AnyArray.CompType
+RAW = 0
+comp_type_names = {
+    0: 'RAW',
+    1: 'ZLIB',
+    2: 'LZO',
+    3: 'RICE',
+    4: 'ZRICE',
+    5: 'LZORICE',
+}
+decompressors = {
+    1: zlib.decompress,
+}
+
+
+def any_array_data(any_array):
+    '''the uncompressed payload of an AnyArray'''
+    current_comp = any_array.current_comp
+    if current_comp == RAW:
+        return any_array.data
+    if current_comp in decompressors:
+        return decompressors[current_comp](any_array.data)
+    # the layout of the other compressed payloads is not documented, and
+    # no AnyArray written with them is known, so they are not guessed at
+    raise NotImplementedError(
+        'AnyArrays compressed with {} are not supported, only {}'.format(
+            comp_type_names.get(current_comp, current_comp),
+            ', '.join(
+                comp_type_names[comp] for comp in [RAW] + sorted(decompressors)
+            )
+        )
+    )
+
+
+def any_array_to_numpy(any_array, out=None):
+    '''convert an AnyArray into a (read-only) numpy array
+
+    out: optional array of the same size, the values are copied into it
+        and `out` is returned.
+    '''
+    any_array_type = any_array.type
+    if any_array_type in any_array_type_to_numpy_type:
+        array = np.frombuffer(
+            any_array_data(any_array),
+            any_array_type_to_numpy_type[any_array_type]
+        )
+    elif any_array_type == 0:
         if any_array.data:
             raise Exception("any_array has no type", any_array)
-        else:
-            return np.array([])
-    if any_array.type == 11:
+        array = empty_array
+    else:
         print(any_array)
         raise Exception(
             "I have no idea if the boolean representation of"
@@ -27,7 +77,13 @@ def any_array_to_numpy(any_array):
             any_array
         )
 
-    return np.frombuffer(
-        any_array.data,
-        any_array_type_to_numpy_type[any_array.type]
-    )
+    if out is None:
+        return array
+    if out.size != array.size:
+        raise ValueError(
+            'out has size {}, but the AnyArray has {} elements'.format(
+                out.size, array.size
+            )
+        )
+    np.copyto(out, array.reshape(out.shape))
+    return out
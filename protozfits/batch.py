@@ -0,0 +1,71 @@
+'''Converting many events into one array
+
+stack_events is the loop shared by the functions that turn a whole Table
+or a sequence of events into one array, e.g. stack_dense_waveforms,
+decode_lstcam or ext_devices.stack_bytes. A Table is read without
+converting its rows, and the array is allocated once, with the layout
+derived from the first event.
+'''
+from .CoreMessages_pb2 import AnyArray
+from .any_array_to_numpy import any_array_to_numpy
+
+
+def stack_events(events, allocate, fill_row, empty, ready=None):
+    '''one array with a row for each event
+
+    events: a Table, whose rows are then read without converting them,
+        or a sequence of events.
+    allocate: allocate(event, n_events) returns the array, e.g.
+        np.empty((n_events, ) + shape of the event)
+    fill_row: fill_row(event, row) copies the values of an event into
+        its row of the array
+    empty: returned if there are no events
+    ready: optional ready(event), whether the layout can be derived from
+        an event. The events before the first ready one are kept until
+        it comes, if none is, the last event is used.
+    '''
+    n_events = len(events)
+    if hasattr(events, 'iter_messages'):
+        events = events.iter_messages()
+
+    out = None
+    waiting = []
+    for i, event in enumerate(events):
+        if out is not None:
+            fill_row(event, out[i])
+            continue
+        waiting.append(event)
+        if ready is None or ready(event):
+            out = _allocate(allocate, waiting, n_events, fill_row)
+
+    if out is None and waiting:
+        out = _allocate(allocate, waiting, n_events, fill_row)
+    if out is None:
+        out = empty
+    return out
+
+
+def to_numpy(value):
+    '''value as numpy array, converting it if it is an AnyArray'''
+    if isinstance(value, AnyArray):
+        return any_array_to_numpy(value)
+    return value
+
+
+def copy_into(value, out):
+    '''copy the values of value into out, which has the same size'''
+    value = to_numpy(value)
+    if value.size != out.size:
+        raise ValueError(
+            'events differ in their number of values: {} != {}'.format(
+                value.size, out.size
+            )
+        )
+    out[...] = value.reshape(out.shape)
+
+
+def _allocate(allocate, waiting, n_events, fill_row):
+    out = allocate(waiting[-1], n_events)
+    for i, event in enumerate(waiting):
+        fill_row(event, out[i])
+    return out
@@ -0,0 +1,146 @@
+'''Decoding of the data of the external devices: TIB, CDTS/UCTS and SWAT
+
+The cameras store what these devices send as opaque byte blobs, e.g.
+`lstcam.tib_data` or `uctsData.data`. Stacked into a (n_events, n_bytes)
+uint8 block, they can be viewed as structured arrays without copying.
+'''
+from operator import attrgetter
+
+import numpy as np
+
+from .batch import stack_events, to_numpy, copy_into
+
+
+# Trigger Interface Board
+TIB_DTYPE = np.dtype([
+    ('event_counter', '<u4'),
+    ('pps_counter', '<u2'),
+    ('tenMHz_counter', 'u1', (3, )),
+    ('stereo_pattern', '<u2'),
+    ('masktrigger', 'u1'),
+])
+
+# Clock Distribution and Trigger time Stamping board, also used for the
+# UCTS data, in the layout of older firmware versions
+CDTS_DTYPE_V1 = np.dtype([
+    ('event_counter', '<u4'),
+    ('pps_counter', '<u4'),
+    ('clock_counter', '<u4'),
+    ('timestamp', '<u8'),
+    ('camera_timestamp', '<u8'),
+    ('trigger_type', 'u1'),
+    ('white_rabbit_status', 'u1'),
+    ('unknown', 'u1'),
+])
+
+CDTS_DTYPE = np.dtype([
+    ('timestamp', '<u8'),
+    ('address', '<u4'),
+    ('event_counter', '<u4'),
+    ('busy_counter', '<u4'),
+    ('pps_counter', '<u4'),
+    ('clock_counter', '<u4'),
+    ('trigger_type', 'u1'),
+    ('white_rabbit_status', 'u1'),
+    ('stereo_pattern', 'u1'),
+    ('num_in_bunch', 'u1'),
+    ('cdts_version', '<u4'),
+])
+
+# SoftWare Array Trigger
+SWAT_DTYPE = np.dtype([
+    ('assigned_event_id', '<u8'),
+    ('trigger_id', '<u8'),
+    ('trigger_type', 'u1'),
+    ('trigger_time_s', '<u4'),
+    ('trigger_time_qns', '<u4'),
+    ('readout_requested', '?'),
+    ('data_available', '?'),
+])
+
+# the layouts of each device, told apart by their size in bytes
+device_dtypes = {
+    'tib': {TIB_DTYPE.itemsize: TIB_DTYPE},
+    'cdts': {
+        CDTS_DTYPE_V1.itemsize: CDTS_DTYPE_V1,
+        CDTS_DTYPE.itemsize: CDTS_DTYPE,
+    },
+    'swat': {SWAT_DTYPE.itemsize: SWAT_DTYPE},
+}
+device_dtypes['ucts'] = device_dtypes['cdts']
+
+
+def device_dtype(device, n_bytes):
+    '''structured dtype of `n_bytes` of data of a device'''
+    try:
+        return device_dtypes[device][n_bytes]
+    except KeyError:
+        raise ValueError(
+            'no known layout of {} data with {} bytes'.format(device, n_bytes)
+        ) from None
+
+
+def decode(data, device):
+    '''view of the data of a device as structured array
+
+    data: uint8 array of shape (n_bytes, ) for a single event, or a
+        (n_events, n_bytes) block as returned by stack_bytes.
+        It is only copied, if it is not C-contiguous already.
+    device: 'tib', 'cdts', 'ucts' or 'swat'
+
+    Returns a (n_events, ) array, or a single record for a single event.
+    '''
+    data = np.ascontiguousarray(data, dtype=np.uint8)
+    dtype = device_dtype(device, data.shape[-1])
+    return data.view(dtype)[..., 0]
+
+
+def decode_tib(data):
+    '''see decode'''
+    return decode(data, 'tib')
+
+
+def decode_cdts(data):
+    '''see decode'''
+    return decode(data, 'cdts')
+
+
+def decode_ucts(data):
+    '''see decode'''
+    return decode(data, 'ucts')
+
+
+def decode_swat(data):
+    '''see decode'''
+    return decode(data, 'swat')
+
+
+def tib_ten_mhz_counter(tib):
+    '''the 24 bit `tenMHz_counter` of decoded TIB data as uint32'''
+    counter = tib['tenMHz_counter'].astype(np.uint32)
+    return counter[..., 0] | counter[..., 1] << 8 | counter[..., 2] << 16
+
+
+def stack_bytes(events, field):
+    '''the byte blobs of many events in one (n_events, n_bytes) array
+
+    events: a Table, whose rows are then read without converting them,
+        or a sequence of events.
+    field: the dotted name of the blob, e.g. 'lstcam.tib_data'
+        or 'uctsData.data'
+    '''
+    get = attrgetter(field)
+
+    def to_bytes(event):
+        return np.ascontiguousarray(to_numpy(get(event))).view(np.uint8)
+
+    def allocate(event, n_events):
+        return np.empty((n_events, to_bytes(event).size), dtype=np.uint8)
+
+    def fill_row(event, row):
+        copy_into(to_bytes(event), row)
+
+    return stack_events(
+        events, allocate, fill_row,
+        empty=np.empty((0, 0), dtype=np.uint8),
+    )
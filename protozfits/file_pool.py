@@ -0,0 +1,98 @@
+'''Keeping many files open, but not too many
+
+A FilePool hands out opened File objects by path. It keeps at most
+`max_open` of them open and closes the least recently used one when
+another file is needed, which bounds the number of file descriptors
+and the memory of the readers.
+'''
+from collections import OrderedDict
+import os
+import threading
+
+
+class FilePool:
+    '''LRU cache of opened Files
+
+    max_open: number of files kept open at most
+    file_kwargs: passed on to File, e.g. metadata_cache or lazy
+
+    The pool can be shared between threads, a File itself can not.
+    A File returned by get() is closed once it gets evicted, so threads
+    should read through read_event(), which also serializes the access
+    to each file.
+    '''
+
+    def __init__(self, max_open=64, **file_kwargs):
+        if max_open < 1:
+            raise ValueError('max_open must be at least 1')
+        self.max_open = max_open
+        self.file_kwargs = file_kwargs
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        '''the opened File of path, opening it if needed'''
+        return self._entry(path)[0]
+
+    def read_event(self, path, index, table='Events'):
+        '''row `index` of `table` in the file at `path`'''
+        while True:
+            file, lock = self._entry(path)
+            with lock:
+                # the file might have been evicted before we got the lock
+                if not file.closed:
+                    return getattr(file, table)[index]
+
+    def _entry(self, path):
+        from . import File
+
+        key = os.path.abspath(path)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        # opening reads the headers, other threads go on meanwhile
+        file = File(path, **self.file_kwargs)
+
+        to_close = []
+        with self._lock:
+            if key in self._entries:
+                # another thread opened the same file in the meantime
+                self._entries.move_to_end(key)
+                entry = self._entries[key]
+                to_close.append((file, threading.Lock()))
+            else:
+                entry = (file, threading.Lock())
+                self._entries[key] = entry
+                while len(self._entries) > self.max_open:
+                    to_close.append(self._entries.popitem(last=False)[1])
+
+        _close_all(to_close)
+        return entry
+
+    def __contains__(self, path):
+        return os.path.abspath(path) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def close(self):
+        '''close all files of the pool'''
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        _close_all(entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        self.close()
+
+
+def _close_all(entries):
+    '''close the files of entries, waiting for their current readers'''
+    for file, lock in entries:
+        with lock:
+            file.close()
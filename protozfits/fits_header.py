@@ -0,0 +1,102 @@
+'''A minimal reader of FITS headers
+
+detect_bintables only needs a few keywords of every HDU, so instead of
+opening the file with astropy, the headers are read block by block and
+the data units in between are skipped.
+'''
+import os
+import re
+
+BLOCK_SIZE = 2880
+CARD_SIZE = 80
+
+string_value = re.compile(r"'((?:[^']|'')*)'")
+
+
+def parse_value(text):
+    '''the value of a header card, text is everything after "= "'''
+    text = text.strip()
+    match = string_value.match(text)
+    if match:
+        return match.group(1).replace("''", "'").rstrip()
+
+    text = text.split('/', 1)[0].strip()
+    if text == 'T':
+        return True
+    if text == 'F':
+        return False
+    if not text:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text.replace('D', 'E'))
+    except ValueError:
+        return text
+
+
+def parse_cards(header):
+    '''dict of the keywords of a header string, which have a value'''
+    cards = {}
+    for start in range(0, len(header), CARD_SIZE):
+        card = header[start:start + CARD_SIZE]
+        keyword = card[:8].strip()
+        if keyword == 'END':
+            break
+        if card[8:10] == '= ' and keyword not in cards:
+            cards[keyword] = parse_value(card[10:])
+    return cards
+
+
+def data_size(cards):
+    '''size of the data unit described by the cards, including padding'''
+    naxis = cards.get('NAXIS', 0)
+    if naxis == 0:
+        return 0
+    n_values = 1
+    for axis in range(1, naxis + 1):
+        n_values *= cards['NAXIS{}'.format(axis)]
+    size = (
+        abs(cards['BITPIX']) // 8
+        * cards.get('GCOUNT', 1)
+        * (cards.get('PCOUNT', 0) + n_values)
+    )
+    return -(-size // BLOCK_SIZE) * BLOCK_SIZE
+
+
+def read_headers(path):
+    '''list of (header, cards) of all HDUs in a FITS file
+
+    header is the header as string, as read from the file,
+    cards the dict of its keywords, see parse_cards.
+    '''
+    headers = []
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        while f.tell() < file_size:
+            blocks = []
+            while True:
+                block = f.read(BLOCK_SIZE)
+                if len(block) < BLOCK_SIZE:
+                    raise ValueError(
+                        'truncated header in {} at byte {}'.format(
+                            path, f.tell()
+                        )
+                    )
+                blocks.append(block.decode('ascii'))
+                if _has_end(block):
+                    break
+            header = ''.join(blocks)
+            cards = parse_cards(header)
+            headers.append((header, cards))
+            f.seek(data_size(cards), os.SEEK_CUR)
+    return headers
+
+
+def _has_end(block):
+    for start in range(0, BLOCK_SIZE, CARD_SIZE):
+        if block[start:start + 8] == b'END     ':
+            return True
+    return False
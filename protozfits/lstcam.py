@@ -0,0 +1,104 @@
+'''Decoding of the LST specific parts of R1 events
+
+`R1_LSTCam_pb2.LstCamEvent` stores the DRAGON module data as raw AnyArrays.
+The functions in here turn them into structured numpy arrays, for many
+events at once, so calibration code does not need to loop over events.
+'''
+import numpy as np
+
+from .batch import stack_events, to_numpy, copy_into
+
+
+# the counters of one DRAGON module, `counters` holds one per module
+DRAGON_COUNTERS_DTYPE = np.dtype([
+    ('pps_counter', '<u2'),
+    ('tenMHz_counter', '<u4'),
+    ('event_counter', '<u4'),
+    ('trigger_counter', '<u4'),
+    ('local_clock_counter', '<u8'),
+])
+
+# fields of LstCamEvent stored per module, with the values of a module
+# reshaped to rows
+per_module_fields = [
+    'module_status',
+    'drs_tag_status',
+    'first_capacitor_id',
+    'chips_flags',
+    'drs_tag',
+]
+
+
+def unpack_counters(counters):
+    '''view of the `counters` of one event as (n_modules, ) array
+    of DRAGON_COUNTERS_DTYPE
+    '''
+    counters = to_numpy(counters)
+    if counters.size % DRAGON_COUNTERS_DTYPE.itemsize:
+        raise ValueError(
+            'counters has {} bytes, not a multiple of {}'.format(
+                counters.size, DRAGON_COUNTERS_DTYPE.itemsize
+            )
+        )
+    return np.ascontiguousarray(counters, dtype=np.uint8).view(
+        DRAGON_COUNTERS_DTYPE
+    )
+
+
+def lstcam_dtype(event):
+    '''structured dtype of decode_lstcam, derived from the first event'''
+    lstcam = event.lstcam
+    n_modules = to_numpy(lstcam.module_status).size
+    if n_modules == 0:
+        raise ValueError('event has no module_status, cannot count modules')
+
+    descr = [('event_id', '<u8')]
+    for name in per_module_fields:
+        value = to_numpy(getattr(lstcam, name))
+        if value.size % n_modules:
+            raise ValueError(
+                '{} has {} values, not a multiple of {} modules'.format(
+                    name, value.size, n_modules
+                )
+            )
+        shape = (n_modules, ) if value.size == n_modules else (
+            n_modules, value.size // n_modules
+        )
+        descr.append((name, value.dtype.newbyteorder('<'), shape))
+
+    n_bytes = to_numpy(lstcam.counters).size
+    if n_bytes != n_modules * DRAGON_COUNTERS_DTYPE.itemsize:
+        raise ValueError(
+            'counters has {} bytes, expected {} for {} modules'.format(
+                n_bytes, n_modules * DRAGON_COUNTERS_DTYPE.itemsize, n_modules
+            )
+        )
+    descr.append(('counters', DRAGON_COUNTERS_DTYPE, (n_modules, )))
+    return np.dtype(descr)
+
+
+def decode_lstcam(events):
+    '''the LstCamEvent data of many events in one (n_events, ) structured
+    array, see lstcam_dtype.
+
+    Per module fields have the shape (n_modules, ) or
+    (n_modules, n_values), e.g. `first_capacitor_id` is
+    (n_modules, n_channels) and `counters['local_clock_counter']` is
+    (n_modules, ).
+
+    events: a Table, whose rows are then read without converting them,
+        or a sequence of R1 events.
+    '''
+    def allocate(event, n_events):
+        return np.zeros(n_events, dtype=lstcam_dtype(event))
+
+    def fill_row(event, row):
+        row['event_id'] = event.event_id
+        for name in per_module_fields:
+            copy_into(getattr(event.lstcam, name), row[name])
+        copy_into(event.lstcam.counters, row['counters'].view(np.uint8))
+
+    return stack_events(
+        events, allocate, fill_row,
+        empty=np.zeros(0, dtype=[('event_id', '<u8')]),
+    )
@@ -0,0 +1,88 @@
+'''A persistent cache of the table descriptions of files
+
+Scanning the headers of a file is cheap, but for many files on a slow
+file system it adds up. A MetadataCache keeps the result of
+detect_bintables in an sqlite database and uses it as long as size and
+modification time of the file are unchanged.
+'''
+import json
+import os
+import sqlite3
+import threading
+
+
+class MetadataCache:
+    '''sqlite backed cache of detect_bintables
+
+    path: the sqlite database, created if it does not exist.
+
+    It can be shared between threads, and several processes can
+    use the same database.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS bintables ('
+                'path TEXT PRIMARY KEY, '
+                'size INTEGER, '
+                'mtime_ns INTEGER, '
+                'descriptions TEXT)'
+            )
+
+    def get(self, path):
+        '''the cached descriptions of a file, None if unknown or outdated'''
+        size, mtime_ns = _file_stat(path)
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT size, mtime_ns, descriptions FROM bintables '
+                'WHERE path = ?',
+                (os.path.abspath(path), )
+            ).fetchone()
+        if row is None or row[:2] != (size, mtime_ns):
+            return None
+
+        from . import BinTableDescription
+        return [
+            BinTableDescription(path=path, **fields)
+            for fields in json.loads(row[2])
+        ]
+
+    def put(self, path, descriptions):
+        '''store the descriptions of a file'''
+        size, mtime_ns = _file_stat(path)
+        descriptions = json.dumps([
+            {k: v for k, v in desc._asdict().items() if k != 'path'}
+            for desc in descriptions
+        ])
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO bintables VALUES (?, ?, ?, ?)',
+                (os.path.abspath(path), size, mtime_ns, descriptions)
+            )
+
+    def detect_bintables(self, path):
+        '''like protozfits.detect_bintables, but using the cache'''
+        descriptions = self.get(path)
+        if descriptions is None:
+            from . import detect_bintables
+            descriptions = detect_bintables(path)
+            self.put(path, descriptions)
+        return descriptions
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        self.close()
+
+
+def _file_stat(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
@@ -4,6 +4,10 @@ cimport numpy as np
 from libcpp.string cimport string
 from libcpp cimport bool as bool_t
 from libcpp.vector cimport vector
+from libcpp.utility cimport move
+from libc.string cimport memcpy
+from cpython.bytes cimport PyBytes_FromStringAndSize, PyBytes_AS_STRING
+from cpython.buffer cimport PyBuffer_FillInfo
 from collections import namedtuple
 
 
@@ -16,13 +20,20 @@ cdef extern from "ProtobufIFits.h" namespace "ACTL::IO":
 
         void CheckIfFileIsConsistent(bool_t update_catalog) except +
 
-        int getNumMessagesInTable()
-        string readSerializedMessage(int number)
+        int getNumMessagesInTable() nogil
+        string readSerializedMessage(int number) nogil
 
+# The GIL is released while the C++ reader decompresses rows, so several
+# readers can be used from different threads in parallel. A single reader
+# must not be shared between threads though, give each thread its own.
+#
+# close() frees the C++ reader, with its file descriptor and buffers,
+# right away. Afterwards every method raises a ValueError.
 cdef class ProtobufIFits:
     cdef _ProtobufIFits* c_protobufifits
-    cdef int n_events
+    cdef readonly int n_events
     cdef string exchange_string
+    cdef int n_exports
 
     def __cinit__(self, fname, tablename=""):
         self.c_protobufifits = new _ProtobufIFits(
@@ -31,18 +42,100 @@ cdef class ProtobufIFits:
         )
         self.n_events = 0
         self.exchange_string = ""
+        self.n_exports = 0
 
     def __dealloc__(self):
         del self.c_protobufifits
 
+    def close(self):
+        '''free the C++ reader, calling close() again does nothing
+
+        A view returned by read_event_view stays valid, its buffer is
+        freed when the last view is released.
+        '''
+        cdef string empty
+        del self.c_protobufifits
+        self.c_protobufifits = NULL
+        if self.n_exports == 0:
+            self.exchange_string.swap(empty)
+
+    @property
+    def closed(self):
+        return self.c_protobufifits == NULL
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        self.close()
+
+    cdef check_open(self):
+        if self.c_protobufifits == NULL:
+            raise ValueError('I/O operation on closed ProtobufIFits')
+
     def CheckIfFileIsConsistent(self, update_catalog):
+        self.check_open()
         self.c_protobufifits.CheckIfFileIsConsistent(update_catalog)
 
     def read_event(self):
+        cdef int num_rows
+        cdef string message
+        self.check_open()
         self.n_events += 1
-        if self.c_protobufifits.getNumMessagesInTable() < self.n_events:
+        with nogil:
+            num_rows = self.c_protobufifits.getNumMessagesInTable()
+        if num_rows < self.n_events:
             raise StopIteration
-        return self.c_protobufifits.readSerializedMessage(self.n_events)
+        with nogil:
+            message = self.c_protobufifits.readSerializedMessage(self.n_events)
+        return message
+
+    def read_events(self, start, count):
+        '''read up to `count` rows, starting at row `start`, in one call
+
+        Like in read_a_given_event, counting starts at one.
+        Returns a tuple (buffer, offsets): buffer is a single bytes object
+        holding all serialized rows back to back, offsets is a uint64 array
+        of length n+1, so row i is buffer[offsets[i]:offsets[i + 1]].
+        Afterwards read_event continues after the last row read.
+        '''
+        cdef int first = start
+        cdef int last = first + count - 1
+        cdef int num_rows
+        cdef vector[string] messages
+        cdef np.uint64_t[:] c_offsets
+        cdef char* dest
+        cdef int i
+
+        self.check_open()
+        with nogil:
+            num_rows = self.c_protobufifits.getNumMessagesInTable()
+        if first < 1:
+            raise IndexError('rows are counted from 1, got {}'.format(start))
+        if first > num_rows:
+            raise StopIteration
+        if last > num_rows:
+            last = num_rows
+
+        with nogil:
+            messages.reserve(last - first + 1)
+            for i in range(first, last + 1):
+                messages.push_back(
+                    move(self.c_protobufifits.readSerializedMessage(i))
+                )
+
+        offsets = np.zeros(messages.size() + 1, dtype=np.uint64)
+        c_offsets = offsets
+        for i in range(<int>messages.size()):
+            c_offsets[i + 1] = c_offsets[i] + messages[i].size()
+
+        buffer = PyBytes_FromStringAndSize(NULL, c_offsets[messages.size()])
+        dest = PyBytes_AS_STRING(buffer)
+        for i in range(<int>messages.size()):
+            memcpy(dest + c_offsets[i], messages[i].data(), messages[i].size())
+
+        self.n_events = last
+        return buffer, offsets
 
     def read_a_given_event(self, event_id):
         tmp = self.n_events
@@ -53,8 +146,64 @@ cdef class ProtobufIFits:
             self.n_events = tmp
             raise
 
+    def read_event_view(self):
+        '''like read_event, but returns a read-only memoryview
+
+        The row is moved into a buffer owned by this reader instead of being
+        copied into a new bytes object. This buffer is reused by the next
+        call, so the view must be released (e.g. by using it in a
+        `with` statement) before reading the next row.
+        '''
+        cdef int num_rows
+        self.check_open()
+        if self.n_exports > 0:
+            raise BufferError(
+                'the previous row is still in use, release its view first'
+            )
+        self.n_events += 1
+        with nogil:
+            num_rows = self.c_protobufifits.getNumMessagesInTable()
+        if num_rows < self.n_events:
+            raise StopIteration
+        with nogil:
+            self.exchange_string = move(
+                self.c_protobufifits.readSerializedMessage(self.n_events)
+            )
+        return memoryview(self)
+
+    def read_a_given_event_view(self, event_id):
+        tmp = self.n_events
+        try:
+            self.n_events = event_id - 1
+            return self.read_event_view()
+        except:
+            self.n_events = tmp
+            raise
+
+    def __getbuffer__(self, Py_buffer *buffer, int flags):
+        PyBuffer_FillInfo(
+            buffer,
+            self,
+            <void*>self.exchange_string.data(),
+            self.exchange_string.size(),
+            1,
+            flags
+        )
+        self.n_exports += 1
+
+    def __releasebuffer__(self, Py_buffer *buffer):
+        cdef string empty
+        self.n_exports -= 1
+        if self.n_exports == 0 and self.c_protobufifits == NULL:
+            self.exchange_string.swap(empty)
+
     def num_rows(self):
-        return self.c_protobufifits.getNumMessagesInTable()
+        cdef int num_rows
+        self.check_open()
+        with nogil:
+            num_rows = self.c_protobufifits.getNumMessagesInTable()
+        return num_rows
 
     def rewind(self):
+        self.check_open()
         self.n_events = 0
@@ -169,6 +169,122 @@ def test_ProtobufIFits_read_a_given_event():
         assert event.eventNumber == FIRST_EVENT_NUMBER + random_id - 1
 
 
+def test_ProtobufIFits_read_events():
+    from protozfits import rawzfits
+    from protozfits import L0_pb2
+
+    ifits = rawzfits.ProtobufIFits(
+        fname=example_file_path,
+        tablename="Events"
+    )
+
+    buffer, offsets = ifits.read_events(3, 4)
+    assert len(offsets) == 5
+    assert offsets[0] == 0
+    assert offsets[-1] == len(buffer)
+
+    for i in range(4):
+        event = L0_pb2.CameraEvent()
+        event.ParseFromString(buffer[offsets[i]:offsets[i + 1]])
+        assert event.eventNumber == FIRST_EVENT_NUMBER + 2 + i
+
+    # reading continues after the batch
+    event = L0_pb2.CameraEvent()
+    event.ParseFromString(ifits.read_event())
+    assert event.eventNumber == FIRST_EVENT_NUMBER + 6
+
+
+def test_ProtobufIFits_read_events_stops_at_end_of_table():
+    from protozfits import rawzfits
+
+    ifits = rawzfits.ProtobufIFits(
+        fname=example_file_path,
+        tablename="Events"
+    )
+
+    buffer, offsets = ifits.read_events(8, 100)
+    assert len(offsets) == EVENTS_IN_EXAMPLE_FILE - 7 + 1
+
+    with pytest.raises(StopIteration):
+        ifits.read_events(EVENTS_IN_EXAMPLE_FILE + 1, 1)
+
+
+def test_ProtobufIFits_read_event_view():
+    from protozfits import rawzfits
+    from protozfits import L0_pb2
+
+    ifits = rawzfits.ProtobufIFits(
+        fname=example_file_path,
+        tablename="Events"
+    )
+    copied = [ifits.read_event() for i in range(ifits.num_rows())]
+
+    ifits.rewind()
+    for raw in copied:
+        with ifits.read_event_view() as view:
+            assert view.readonly
+            assert view.tobytes() == raw
+
+            event = L0_pb2.CameraEvent()
+            event.ParseFromString(view)
+
+    with ifits.read_a_given_event_view(3) as view:
+        assert view.tobytes() == copied[2]
+
+
+def test_ProtobufIFits_read_event_view_refuses_to_overwrite_used_buffer():
+    from protozfits import rawzfits
+
+    ifits = rawzfits.ProtobufIFits(
+        fname=example_file_path,
+        tablename="Events"
+    )
+    view = ifits.read_event_view()
+    with pytest.raises(BufferError):
+        ifits.read_event_view()
+
+    view.release()
+    ifits.read_event_view().release()
+
+
+def test_ProtobufIFits_can_be_read_from_several_threads():
+    from concurrent.futures import ThreadPoolExecutor
+    from protozfits import rawzfits
+
+    def read_all(path):
+        ifits = rawzfits.ProtobufIFits(fname=path, tablename="Events")
+        return [ifits.read_event() for i in range(ifits.num_rows())]
+
+    expected = read_all(example_file_path)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for rows in executor.map(read_all, [example_file_path] * 4):
+            assert rows == expected
+
+
+def test_ProtobufIFits_close():
+    from protozfits import rawzfits
+
+    with rawzfits.ProtobufIFits(
+        fname=example_file_path,
+        tablename="Events"
+    ) as ifits:
+        assert not ifits.closed
+        view = ifits.read_event_view()
+        raw = view.tobytes()
+
+    assert ifits.closed
+    # views stay valid after closing
+    assert view.tobytes() == raw
+    view.release()
+
+    for name in ('read_event', 'num_rows', 'rewind'):
+        with pytest.raises(ValueError):
+            getattr(ifits, name)()
+    with pytest.raises(ValueError):
+        ifits.read_events(1, 1)
+    ifits.close()
+
+
 #  We know the iteration part works so we do not want to
 # repeat that in every test ... that's boring for you to read
 
@@ -1,6 +1,10 @@
+import pytest
+import numpy as np
 import pkg_resources
 import os
 from protozfits import File
+from protozfits import dense_waveforms, stack_dense_waveforms
+from protozfits import stack_dense_integrals
 
 example_file_path = pkg_resources.resource_filename(
     'protozfits',
@@ -50,3 +54,305 @@ def test_File_getitem_with_range():
     expected_event_numbers = [FIRST_EVENT_NUMBER + i for i in interesting_event_ids]
     for i, event in enumerate(f.Events[interesting_event_ids]):
         assert event.eventNumber == expected_event_numbers[i]
+
+
+def test_Table_read_batch():
+    f = File(example_file_path)
+    events = f.Events.read_batch(4)
+    assert [e.eventNumber for e in events] == [
+        FIRST_EVENT_NUMBER + i for i in range(4)
+    ]
+
+    # iteration continues after the batch
+    assert next(f.Events).eventNumber == FIRST_EVENT_NUMBER + 4
+
+    rest = f.Events.read_batch(100)
+    assert len(rest) == EVENTS_IN_EXAMPLE_FILE - 5
+    assert f.Events.read_batch(100) == []
+
+    with pytest.raises(ValueError):
+        f.Events.read_batch(0)
+
+
+def test_Table_iter_prefetch():
+    f = File(example_file_path)
+    event_numbers = [
+        event.eventNumber
+        for event in f.Events.iter_prefetch(depth=3, workers=2)
+    ]
+    assert event_numbers == [
+        FIRST_EVENT_NUMBER + i for i in range(EVENTS_IN_EXAMPLE_FILE)
+    ]
+
+
+def test_Table_iter_prefetch_can_be_stopped_early():
+    f = File(example_file_path)
+    for i, event in enumerate(f.Events.iter_prefetch(depth=4)):
+        if i == 2:
+            break
+    assert event.eventNumber == FIRST_EVENT_NUMBER + 2
+
+
+def test_Table_iter_prefetch_checks_arguments():
+    f = File(example_file_path)
+    with pytest.raises(ValueError):
+        f.Events.iter_prefetch(depth=0)
+    with pytest.raises(ValueError):
+        f.Events.iter_prefetch(workers=0)
+
+    f.close()
+    # raised right away, not on the first next()
+    with pytest.raises(ValueError):
+        f.Events.iter_prefetch()
+
+
+def event_number(event):
+    return event.eventNumber
+
+
+def test_Table_parallel_map():
+    f = File(example_file_path)
+    event_numbers = list(
+        f.Events.parallel_map(event_number, processes=2, chunksize=3)
+    )
+    assert event_numbers == [
+        FIRST_EVENT_NUMBER + i for i in range(EVENTS_IN_EXAMPLE_FILE)
+    ]
+
+
+def worker_reader(event):
+    from protozfits import _map_worker
+    return os.getpid(), id(_map_worker['table'].protobuf_i_fits)
+
+
+def test_Table_parallel_map_opens_one_reader_per_process():
+    f = File(example_file_path)
+    readers = {}
+    for pid, reader in f.Events.parallel_map(
+        worker_reader, processes=2, chunksize=1
+    ):
+        readers.setdefault(pid, set()).add(reader)
+    assert all(len(ids) == 1 for ids in readers.values())
+
+
+def test_File_with_fields():
+    f = File(
+        example_file_path,
+        fields=['eventNumber', 'hiGain.waveforms.samples', 'trig']
+    )
+    event = f.Events[0]
+    assert event._fields == ('eventNumber', 'hiGain', 'trig')
+    assert event.eventNumber == FIRST_EVENT_NUMBER
+    assert event.hiGain._fields == ('waveforms', )
+    assert event.hiGain.waveforms._fields == ('samples', )
+    assert len(event.trig._fields) == 4
+
+
+def test_File_with_unknown_field():
+    with pytest.raises(ValueError):
+        File(example_file_path, fields=['hiGain.no_such_field'])
+
+
+def test_File_lazy():
+    f = File(example_file_path, lazy=True)
+    event = f.Events[0]
+    assert 'hiGain' not in vars(event)
+    assert 'hiGain' in dir(event)
+
+    assert event.eventNumber == FIRST_EVENT_NUMBER
+    samples = event.hiGain.waveforms.samples
+    assert 'hiGain' in vars(event)
+    assert samples is event.hiGain.waveforms.samples
+
+    eager = File(example_file_path).Events[0]
+    assert event._fields == eager._fields
+    assert (samples == eager.hiGain.waveforms.samples).all()
+    assert repr(event).startswith('CameraEvent(')
+
+
+def test_dense_waveforms():
+    event = File(example_file_path).Events[0]
+    waveforms = event.hiGain.waveforms
+
+    dense = dense_waveforms(event, EXPECTED_NUMBER_OF_PIXELS)
+    assert dense.shape == (
+        EXPECTED_NUMBER_OF_PIXELS,
+        EXPECTED_NUMBER_OF_SAMPLES
+    )
+    assert dense.dtype == np.int16
+
+    pixels = waveforms.pixelsIndices
+    assert (
+        dense[pixels] == waveforms.samples.reshape(len(pixels), -1)
+    ).all()
+
+
+def test_dense_waveforms_fills_missing_pixels():
+    event = File(example_file_path).Events[0]
+    n_pixels = EXPECTED_NUMBER_OF_PIXELS + 10
+
+    dense = dense_waveforms(event, n_pixels, fill=-1)
+    assert (dense[-10:] == -1).all()
+
+
+def test_stack_dense_waveforms():
+    f = File(example_file_path)
+    stacked = stack_dense_waveforms(f.Events, EXPECTED_NUMBER_OF_PIXELS)
+    assert stacked.shape == (
+        EVENTS_IN_EXAMPLE_FILE,
+        EXPECTED_NUMBER_OF_PIXELS,
+        EXPECTED_NUMBER_OF_SAMPLES,
+    )
+    assert (
+        stacked[3] == dense_waveforms(f.Events[3], EXPECTED_NUMBER_OF_PIXELS)
+    ).all()
+
+
+def l0_event(samples=None, n_samples=0):
+    from protozfits.L0_pb2 import CameraEvent
+    event = CameraEvent()
+    waveforms = event.hiGain.waveforms
+    waveforms.samples.type = 3
+    waveforms.num_samples = n_samples
+    if samples is not None:
+        waveforms.samples.data = np.asarray(samples, np.int16).tobytes()
+    return event
+
+
+def test_dense_waveforms_of_empty_event_keeps_dtype():
+    dense = dense_waveforms(l0_event(), 4)
+    assert dense.shape == (4, 0)
+    assert dense.dtype == np.int16
+
+
+def test_stack_dense_waveforms_starting_with_empty_events():
+    n_pixels, n_samples = 4, 3
+    samples = np.arange(n_pixels * n_samples)
+    events = [
+        l0_event(),
+        l0_event(samples, n_samples),
+        l0_event(),
+        l0_event(samples + 1, n_samples),
+    ]
+
+    stacked = stack_dense_waveforms(events, n_pixels, fill=-1)
+    assert stacked.shape == (4, n_pixels, n_samples)
+    assert stacked.dtype == np.int16
+    assert (stacked[[0, 2]] == -1).all()
+    assert (stacked[1].ravel() == samples).all()
+    assert (stacked[3].ravel() == samples + 1).all()
+
+    stacked = stack_dense_waveforms([l0_event(), l0_event()], n_pixels)
+    assert stacked.shape == (2, n_pixels, 0)
+    assert stacked.dtype == np.int16
+
+    assert stack_dense_waveforms([], n_pixels).shape == (0, n_pixels, 0)
+    assert stack_dense_integrals([], n_pixels).shape == (0, n_pixels)
+
+
+def test_File_opens_tables_on_access():
+    f = File(example_file_path)
+    assert 'Events' not in vars(f)
+    assert 'Events' in dir(f)
+    assert len(f.Events) == EVENTS_IN_EXAMPLE_FILE
+    assert 'Events' in vars(f)
+    assert f.Events is f.Events
+    assert list(f.tables) == ['Events']
+
+    with pytest.raises(AttributeError):
+        f.NoSuchTable
+
+
+def test_File_close():
+    with File(example_file_path) as f:
+        events = f.Events
+        next(events)
+    assert f.closed
+    assert events.closed
+    with pytest.raises(ValueError):
+        next(events)
+    with pytest.raises(ValueError):
+        events[0]
+
+
+def test_iter_prefetch_closes_its_readers(monkeypatch):
+    from protozfits import rawzfits
+    ProtobufIFits = rawzfits.ProtobufIFits
+    readers = []
+
+    def recording_reader(*args):
+        reader = ProtobufIFits(*args)
+        readers.append(reader)
+        return reader
+
+    f = File(example_file_path)
+    f.Events.protobuf_i_fits
+    monkeypatch.setattr(rawzfits, 'ProtobufIFits', recording_reader)
+
+    rows = f.Events.iter_prefetch(depth=2, workers=2)
+    next(rows)
+    assert readers
+    assert not any(reader.closed for reader in readers)
+    rows.close()
+    assert all(reader.closed for reader in readers)
+
+    f.close()
+    with pytest.raises(ValueError):
+        list(f.Events.iter_prefetch())
+
+
+@pytest.fixture
+def prebuilt_rawzfits(monkeypatch):
+    '''readers with only the methods of the prebuilt rawzfits binaries'''
+    from protozfits import rawzfits
+    ProtobufIFits = rawzfits.ProtobufIFits
+
+    class PrebuiltProtobufIFits:
+        def __init__(self, fname, tablename=''):
+            self._reader = ProtobufIFits(fname, tablename)
+
+        def read_event(self):
+            return self._reader.read_event()
+
+        def read_a_given_event(self, event_id):
+            return self._reader.read_a_given_event(event_id)
+
+        def num_rows(self):
+            return self._reader.num_rows()
+
+        def rewind(self):
+            self._reader.rewind()
+
+    monkeypatch.setattr(rawzfits, 'ProtobufIFits', PrebuiltProtobufIFits)
+
+
+def test_Table_with_prebuilt_rawzfits(prebuilt_rawzfits):
+    f = File(example_file_path)
+    event_numbers = [event.eventNumber for event in f.Events]
+    assert len(event_numbers) == EVENTS_IN_EXAMPLE_FILE
+    assert event_numbers[0] == FIRST_EVENT_NUMBER
+    assert f.Events[3].eventNumber == event_numbers[3]
+
+
+def test_File_close_with_prebuilt_rawzfits(prebuilt_rawzfits):
+    with File(example_file_path) as f:
+        next(f.Events)
+        list(f.Events.iter_prefetch(depth=2, workers=2))
+    assert f.closed
+    with pytest.raises(ValueError):
+        f.Events[0]
+
+
+def test_read_batch_with_prebuilt_rawzfits(prebuilt_rawzfits):
+    f = File(example_file_path)
+    events = f.Events.read_batch(4)
+    assert [e.eventNumber for e in events] == [
+        FIRST_EVENT_NUMBER + i for i in range(4)
+    ]
+    assert next(f.Events).eventNumber == FIRST_EVENT_NUMBER + 4
+    assert len(f.Events.read_batch(100)) == EVENTS_IN_EXAMPLE_FILE - 5
+    assert f.Events.read_batch(100) == []
+
+    event_numbers = f.Events.to_columns(['eventNumber'], batch_size=3)
+    assert len(event_numbers['eventNumber']) == EVENTS_IN_EXAMPLE_FILE
+    assert event_numbers['eventNumber'][0] == FIRST_EVENT_NUMBER
@@ -12,6 +12,15 @@ example_file_path = pkg_resources.resource_filename(
     )
 )
 
+lst_path = pkg_resources.resource_filename(
+    'protozfits',
+    os.path.join(
+        'tests',
+        'resources',
+        'example_LST_R1_10_evts.fits.fz'
+    )
+)
+
 EVENTS_IN_EXAMPLE_FILE = 10
 EXPECTED_NUMBER_OF_PIXELS = 1296
 EXPECTED_NUMBER_OF_SAMPLES = 50
@@ -67,3 +76,75 @@ def test_headers():
 
     for path, value in f.headers['PBFHEAD'].items():
         assert File(path).Events.header['PBFHEAD'] == value
+
+
+def test_merge_order():
+    f = MultiZFitsFiles([lst_path, lst_path, lst_path])
+    event_ids = [e.event_id for e in f]
+    assert event_ids == sorted(event_ids)
+    assert len(event_ids) == 3 * len(File(lst_path).Events)
+
+
+def test_merge_key():
+    key = ('trigger_time_s', 'trigger_time_qns')
+    times = [
+        (e.trigger_time_s, e.trigger_time_qns)
+        for e in MultiZFitsFiles([lst_path, lst_path], key=key)
+    ]
+    assert times == sorted(times)
+
+    # equal keys come in the order of the paths
+    merged = MultiZFitsFiles(
+        [lst_path, lst_path], key=lambda e: e.event_id // 2
+    )
+    event_ids = [e.event_id for e in merged]
+    assert event_ids[:2] == [event_ids[0]] * 2
+
+
+def test_getitem():
+    f = MultiZFitsFiles([lst_path, lst_path])
+    merged = [e.event_id for e in MultiZFitsFiles([lst_path, lst_path])]
+
+    assert f[0].event_id == merged[0]
+    assert f[-1].event_id == merged[-1]
+    assert [e.event_id for e in f[3:9:2]] == merged[3:9:2]
+    assert [e.event_id for e in f[[5, 1]]] == [merged[5], merged[1]]
+
+    # random access does not disturb iteration
+    assert [e.event_id for e in f] == merged
+
+
+def test_index_path(tmpdir):
+    index_path = str(tmpdir.join('index.npz'))
+    streams, rows = MultiZFitsFiles(
+        [lst_path, lst_path], index_path=index_path
+    ).index
+    assert os.path.exists(index_path)
+
+    f = MultiZFitsFiles([lst_path, lst_path], index_path=index_path)
+    stored_streams, stored_rows = f.index
+    assert (stored_streams == streams).all()
+    assert (stored_rows == rows).all()
+
+    # the stored index is not used for other files
+    f = MultiZFitsFiles([lst_path], index_path=index_path)
+    assert len(f.index[0]) == len(streams) // 2
+
+
+def test_prefetch():
+    paths = [lst_path, lst_path, lst_path]
+    merged = [e.event_id for e in MultiZFitsFiles(paths)]
+    with MultiZFitsFiles(paths, prefetch=4) as f:
+        assert [e.event_id for e in f] == merged
+
+    # leaving early stops the readers
+    with MultiZFitsFiles([lst_path, lst_path], prefetch=4) as f:
+        next(f)
+
+
+def test_many_files():
+    # enough files to scan their headers in parallel
+    paths = [lst_path] * 8
+    f = MultiZFitsFiles(paths)
+    assert len(f) == 8 * len(File(lst_path).Events)
+    assert sum(1 for e in f) == len(f)
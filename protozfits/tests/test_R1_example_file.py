@@ -1,3 +1,4 @@
+import pytest
 import numpy as np
 import pkg_resources
 import os
@@ -30,6 +31,172 @@ def test_can_iterate_over_events_and_run_header():
             assert event.lstcam.counters.shape == (44,)
 
 
+def test_Table_to_columns():
+    with File(example_file_path) as f:
+        columns = f.Events.to_columns([
+            'event_id',
+            'trigger_type',
+            'waveform',
+            'lstcam.first_capacitor_id',
+        ])
+
+    assert (columns['event_id'] == np.arange(1, 11)).all()
+    assert columns['event_id'].dtype == np.uint64
+    assert columns['trigger_type'].shape == (10,)
+    assert columns['waveform'].shape == (10, 1120)
+    assert columns['waveform'].dtype == np.uint16
+    assert columns['lstcam.first_capacitor_id'].shape == (10, 16)
+
+
+def test_Table_to_columns_of_empty_table(monkeypatch):
+    from protozfits import Table, detect_bintables
+    desc = [
+        btd for btd in detect_bintables(example_file_path)
+        if btd.extname == 'Events'
+    ][0]
+    table = Table(desc._replace(znaxis2=0))
+    monkeypatch.setattr(table, 'iter_messages', lambda batch_size: iter([]))
+
+    columns = table.to_columns(['event_id', 'waveform'])
+    assert columns['event_id'].shape == (0, )
+    assert columns['event_id'].dtype == np.uint64
+    assert columns['waveform'].shape == (0, 0)
+
+
+def test_Table_to_columns_with_unknown_field():
+    with File(example_file_path) as f:
+        for field in ['foo', 'lstcam.foo', 'event_id.foo']:
+            with pytest.raises(ValueError):
+                f.Events.to_columns([field])
+
+
+def test_Table_to_columns_does_not_disturb_iteration():
+    with File(example_file_path) as f:
+        event_ids = []
+        for event in f.Events:
+            event_ids.append(event.event_id)
+            columns = f.Events.to_columns(['event_id'])
+            assert len(columns['event_id']) == 10
+
+    assert event_ids == list(range(1, 11))
+
+
+def test_make_namedtuple_agrees_with_message_getitem():
+    from protozfits import make_namedtuple, message_getitem
+
+    with File(example_file_path, pure_protobuf=True) as f:
+        message = next(f.Events)
+
+    event = make_namedtuple(message)
+    for name in event._fields:
+        expected = message_getitem(message, name)
+        value = getattr(event, name)
+        if isinstance(expected, np.ndarray):
+            assert (value == expected).all()
+            assert value.dtype == expected.dtype
+        elif name not in ('nectarcam', 'lstcam', 'digicam'):
+            assert value == expected
+
+
+def test_File_reshape_waveforms():
+    with File(example_file_path, reshape_waveforms=True) as f:
+        camera_config = f.CameraConfig[0]
+        shape = (camera_config.num_pixels, camera_config.num_samples)
+
+        event = f.Events[0]
+        assert event.waveform.shape == (2, ) + shape
+        flat = File(example_file_path).Events[0].waveform
+        assert (event.waveform.ravel() == flat).all()
+
+        columns = f.Events.to_columns(['waveform'])
+        assert columns['waveform'].shape == (10, 2) + shape
+
+
+def test_File_reorder_pixels():
+    with File(example_file_path, reorder_pixels=True) as f:
+        camera_config = f.CameraConfig[0]
+        order = np.argsort(camera_config.expected_pixels_id)
+        shape = (-1, camera_config.num_pixels, camera_config.num_samples)
+
+        event = f.Events[0]
+        original = File(example_file_path).Events[0]
+
+        assert event.waveform.shape == original.waveform.shape
+        assert (
+            event.waveform.reshape(shape)
+            == original.waveform.reshape(shape)[:, order]
+        ).all()
+        assert (event.pixel_status == original.pixel_status[order]).all()
+
+    with File(
+        example_file_path, reorder_pixels=True, reshape_waveforms=True
+    ) as f:
+        waveform = f.Events[0].waveform
+        assert (waveform == original.waveform.reshape(shape)[:, order]).all()
+
+
+def test_read_run_header_closes_its_reader(monkeypatch):
+    from protozfits import rawzfits, read_run_header, detect_bintables
+    ProtobufIFits = rawzfits.ProtobufIFits
+    readers = []
+
+    def recording_reader(*args):
+        reader = ProtobufIFits(*args)
+        readers.append(reader)
+        return reader
+
+    monkeypatch.setattr(rawzfits, 'ProtobufIFits', recording_reader)
+    run_header = read_run_header(detect_bintables(example_file_path))
+    assert run_header.num_pixels == 14
+    assert len(readers) == 1
+    assert readers[0].closed
+
+
+def test_event_transforms_reorder_shuffled_pixels(monkeypatch):
+    import protozfits
+    from protozfits import converter, make_event_transforms
+    from protozfits.R1_pb2 import CameraConfiguration, CameraEvent
+
+    n_gains, n_pixels, n_samples = 2, 5, 3
+    expected_pixels_id = np.array([3, 0, 4, 1, 2], dtype=np.uint16)
+    run_header = CameraConfiguration(
+        num_pixels=n_pixels, num_samples=n_samples
+    )
+    run_header.expected_pixels_id.type = 4
+    run_header.expected_pixels_id.data = expected_pixels_id.tobytes()
+    monkeypatch.setattr(protozfits, 'read_run_header', lambda _: run_header)
+
+    # every value encodes the id of its pixel, reordered the ids count up
+    gain, pixel, sample = np.indices((n_gains, n_pixels, n_samples))
+    waveform = 100 * expected_pixels_id[pixel] + 10 * gain + sample
+    event = CameraEvent()
+    for field, values, any_array_type in [
+        (event.waveform, waveform.astype(np.uint16), 4),
+        (event.pixel_status, expected_pixels_id.astype(np.uint8), 2),
+        (event.nectarcam.charges_gain1, expected_pixels_id + 0.5, 10),
+        (event.nectarcam.charges_gain2, expected_pixels_id + 0.25, 10),
+    ]:
+        field.type = any_array_type
+        field.data = values.tobytes()
+
+    transforms = make_event_transforms([], reorder_pixels=True)
+    reordered = converter(CameraEvent, transforms=transforms)(event)
+    ids = np.arange(n_pixels)
+    assert (reordered.waveform == (
+        100 * ids[pixel] + 10 * gain + sample
+    ).ravel()).all()
+    assert (reordered.pixel_status == ids).all()
+    assert (reordered.nectarcam.charges_gain1 == ids + 0.5).all()
+    assert (reordered.nectarcam.charges_gain2 == ids + 0.25).all()
+
+    transforms = make_event_transforms(
+        [], reorder_pixels=True, reshape_waveforms=True
+    )
+    reordered = converter(CameraEvent, transforms=transforms)(event)
+    assert reordered.waveform.shape == (n_gains, n_pixels, n_samples)
+    assert (reordered.waveform == 100 * ids[pixel] + 10 * gain + sample).all()
+
+
 glob_path = pkg_resources.resource_filename(
     'protozfits',
     os.path.join(
@@ -0,0 +1,86 @@
+import zlib
+import pytest
+import numpy as np
+
+from protozfits import any_array_to_numpy
+from protozfits.CoreMessages_pb2 import AnyArray
+
+
+def make_any_array(values, any_array_type):
+    any_array = AnyArray()
+    any_array.type = any_array_type
+    any_array.data = values.tobytes()
+    return any_array
+
+
+def test_any_array_to_numpy_dtypes():
+    for any_array_type, dtype in [
+        (1, np.int8),
+        (4, np.uint16),
+        (8, np.uint64),
+        (10, np.float64),
+    ]:
+        values = np.arange(5, dtype=dtype)
+        array = any_array_to_numpy(make_any_array(values, any_array_type))
+        assert array.dtype == dtype
+        assert (array == values).all()
+
+
+def test_empty_any_arrays_share_a_read_only_array():
+    a = any_array_to_numpy(AnyArray())
+    b = any_array_to_numpy(AnyArray())
+    assert a is b
+    assert a.shape == (0, )
+    assert not a.flags.writeable
+
+
+def test_any_array_to_numpy_with_out():
+    values = np.arange(12, dtype=np.uint16)
+    out = np.zeros((3, 4), dtype=np.uint16)
+
+    result = any_array_to_numpy(make_any_array(values, 4), out=out)
+    assert result is out
+    assert (out.ravel() == values).all()
+
+    with pytest.raises(ValueError):
+        any_array_to_numpy(make_any_array(values, 4), out=np.zeros(5))
+
+
+# the event_id column of example_LST_R1_10_evts.fits.fz, as the ZFITS
+# library compressed it: the low 32 bits of the ten ids, then the high ones
+written_zlib = bytes.fromhex(
+    '789c63646060600262662066016256206603627620e600624e20e662201e'
+    '00000c580038'
+)
+
+
+def test_any_array_to_numpy_decompresses_written_zlib():
+    any_array = AnyArray()
+    any_array.type = 6
+    any_array.current_comp = 1
+    any_array.data = written_zlib
+
+    array = any_array_to_numpy(any_array)
+    assert array.dtype == np.uint32
+    assert (array[:10] == np.arange(1, 11)).all()
+    assert (array[10:] == 0).all()
+
+
+def test_any_array_to_numpy_decompresses_zlib():
+    values = np.arange(1000, dtype=np.int16)
+    any_array = AnyArray()
+    any_array.type = 3
+    any_array.current_comp = 1
+    any_array.data = zlib.compress(values.tobytes())
+
+    array = any_array_to_numpy(any_array)
+    assert array.dtype == np.int16
+    assert (array == values).all()
+
+
+def test_any_array_to_numpy_refuses_unknown_compression():
+    any_array = make_any_array(np.arange(10, dtype=np.uint16), 4)
+    for current_comp in (2, 3, 4, 5):
+        any_array.current_comp = current_comp
+        with pytest.raises(NotImplementedError):
+            any_array_to_numpy(any_array)
@@ -0,0 +1,35 @@
+import pytest
+import numpy as np
+
+from protozfits.batch import stack_events, copy_into
+
+
+def fill_row(event, row):
+    copy_into(np.array(event), row[:len(event)])
+
+
+def stack(events, ready=None):
+    return stack_events(
+        events,
+        allocate=lambda event, n_events: np.zeros((n_events, len(event))),
+        fill_row=fill_row,
+        empty=np.empty((0, 0)),
+        ready=ready,
+    )
+
+
+def test_stack_events():
+    assert (stack([[1, 2], [3, 4]]) == [[1, 2], [3, 4]]).all()
+    assert stack([]).shape == (0, 0)
+
+
+def test_stack_events_waits_for_a_ready_event():
+    stacked = stack([[], [1, 2], []], ready=len)
+    assert (stacked == [[0, 0], [1, 2], [0, 0]]).all()
+
+    assert stack([[], []], ready=len).shape == (2, 0)
+
+
+def test_copy_into_checks_the_size():
+    with pytest.raises(ValueError):
+        copy_into(np.arange(3), np.zeros(2))
@@ -0,0 +1,76 @@
+import pkg_resources
+import os
+import struct
+import numpy as np
+import pytest
+
+example_file_path = pkg_resources.resource_filename(
+    'protozfits',
+    os.path.join(
+        'tests',
+        'resources',
+        'example_LST_R1_10_evts.fits.fz'
+    )
+)
+
+
+def test_dtype_sizes():
+    from protozfits.ext_devices import (
+        TIB_DTYPE, CDTS_DTYPE_V1, CDTS_DTYPE, SWAT_DTYPE
+    )
+    assert TIB_DTYPE.itemsize == 12
+    assert CDTS_DTYPE_V1.itemsize == 31
+    assert CDTS_DTYPE.itemsize == 36
+    assert SWAT_DTYPE.itemsize == 27
+
+
+def test_decode_cdts_agrees_with_struct():
+    from protozfits.ext_devices import decode_cdts
+
+    layout = '<IIIQQBBB'
+    blobs = [
+        struct.pack(layout, i, 2 * i, 3 * i, 2**40 + i, 2**33 + i, 1, 2, 0)
+        for i in range(5)
+    ]
+    block = np.frombuffer(b''.join(blobs), dtype=np.uint8).reshape(5, 31)
+
+    cdts = decode_cdts(block)
+    assert np.shares_memory(cdts, block)
+    assert cdts.shape == (5, )
+    for row, blob in zip(cdts, blobs):
+        assert tuple(row) == struct.unpack(layout, blob)
+
+    assert decode_cdts(block[2])['event_counter'] == 2
+
+
+def test_decode_tib():
+    from protozfits.ext_devices import decode_tib, tib_ten_mhz_counter
+
+    blob = struct.pack('<IH', 7, 3) + (123456).to_bytes(3, 'little')
+    blob += struct.pack('<HB', 5, 1)
+    tib = decode_tib(np.frombuffer(blob * 2, dtype=np.uint8).reshape(2, 12))
+    assert (tib['event_counter'] == 7).all()
+    assert (tib_ten_mhz_counter(tib) == 123456).all()
+    assert (tib['masktrigger'] == 1).all()
+
+
+def test_decode_unknown_size():
+    from protozfits.ext_devices import decode
+
+    with pytest.raises(ValueError):
+        decode(np.zeros((3, 13), dtype=np.uint8), 'tib')
+
+
+def test_stack_bytes():
+    from protozfits import File
+    from protozfits.ext_devices import stack_bytes, decode_tib
+
+    with File(example_file_path) as f:
+        block = stack_bytes(f.Events, 'lstcam.tib_data')
+        events = list(f.Events)
+
+    assert block.shape == (10, 12)
+    assert (stack_bytes(events, 'lstcam.tib_data') == block).all()
+    tib = decode_tib(block)
+    for row, event in zip(tib, events):
+        assert row.tobytes() == event.lstcam.tib_data.tobytes()
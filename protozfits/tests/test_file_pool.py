@@ -0,0 +1,114 @@
+import pkg_resources
+import os
+import pytest
+
+resources = pkg_resources.resource_filename(
+    'protozfits',
+    os.path.join('tests', 'resources')
+)
+lst_path = os.path.join(resources, 'example_LST_R1_10_evts.fits.fz')
+l0_path = os.path.join(resources, 'example_10evts.fits.fz')
+nectarcam_path = os.path.join(resources, 'example_9evts_NectarCAM.fits.fz')
+
+
+def test_pool_reuses_files():
+    from protozfits import FilePool
+
+    with FilePool(max_open=2) as pool:
+        f = pool.get(lst_path)
+        assert pool.get(lst_path) is f
+        assert lst_path in pool
+        assert len(pool) == 1
+
+
+def test_pool_evicts_least_recently_used():
+    from protozfits import FilePool
+
+    pool = FilePool(max_open=2)
+    lst = pool.get(lst_path)
+    pool.get(l0_path)
+    pool.get(lst_path)
+    pool.get(nectarcam_path)
+
+    assert len(pool) == 2
+    assert lst_path in pool
+    assert l0_path not in pool
+    assert not lst.closed
+
+    pool.close()
+    assert lst.closed
+    assert len(pool) == 0
+
+
+def test_pool_read_event():
+    from protozfits import FilePool, File
+    from concurrent.futures import ThreadPoolExecutor
+
+    expected = [e.event_id for e in File(lst_path).Events]
+    with FilePool(max_open=1) as pool:
+        def read(index):
+            return pool.read_event(lst_path, index).event_id
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            assert list(executor.map(read, range(10))) == expected
+
+        run_header = pool.read_event(lst_path, 0, table='CameraConfig')
+        assert run_header.num_pixels > 0
+
+
+def test_pool_read_event_while_evicting():
+    from protozfits import FilePool, File
+    from concurrent.futures import ThreadPoolExecutor
+
+    paths = [lst_path, l0_path, nectarcam_path]
+    expected = {
+        path: [event_number(event) for event in File(path).Events]
+        for path in paths
+    }
+    requests = [
+        (path, index % len(expected[path]))
+        for index in range(60)
+        for path in paths
+    ]
+
+    with FilePool(max_open=2) as pool:
+        def read(request):
+            return pool.read_event(*request)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            events = list(executor.map(read, requests))
+        assert len(pool) <= 2
+
+    for (path, index), event in zip(requests, events):
+        assert event_number(event) == expected[path][index]
+
+
+def event_number(event):
+    # the L0 examples count in eventNumber, the R1 ones in event_id
+    return getattr(event, 'eventNumber', None), event.event_id
+
+
+def test_pool_read_event_reopens_evicted_file():
+    from protozfits import FilePool, File
+
+    class EvictingPool(FilePool):
+        # another thread evicts the file before read_event locks it
+        def _entry(self, path):
+            entry = super()._entry(path)
+            if path == lst_path and not evicted:
+                evicted.append(entry[0])
+                self.get(l0_path)
+            return entry
+
+    evicted = []
+    with EvictingPool(max_open=1) as pool:
+        event = pool.read_event(lst_path, 3)
+    assert evicted[0].closed
+    assert event.event_id == File(lst_path).Events[3].event_id
+
+
+def test_pool_max_open():
+    from protozfits import FilePool
+
+    with pytest.raises(ValueError):
+        FilePool(max_open=0)
@@ -0,0 +1,45 @@
+import pkg_resources
+import os
+from glob import glob
+import pytest
+
+resources = pkg_resources.resource_filename(
+    'protozfits',
+    os.path.join('tests', 'resources')
+)
+paths = glob(os.path.join(resources, '*.fits.fz'))
+
+
+@pytest.mark.parametrize('path', paths)
+def test_read_headers_agrees_with_astropy(path):
+    from astropy.io import fits
+    from protozfits.fits_header import read_headers
+
+    headers = read_headers(path)
+    with fits.open(path) as hdul:
+        assert len(headers) == len(hdul)
+        for (header, cards), hdu in zip(headers, hdul):
+            assert fits.Header.fromstring(header) == hdu.header
+            for keyword in ('XTENSION', 'EXTNAME', 'PBFHEAD', 'ZNAXIS2'):
+                if keyword in hdu.header:
+                    assert cards[keyword] == hdu.header[keyword]
+
+
+def test_parse_value():
+    from protozfits.fits_header import parse_value
+
+    assert parse_value("'BINTABLE'           / binary table") == 'BINTABLE'
+    assert parse_value("'it''s'") == "it's"
+    assert parse_value('                  42 / answer') == 42
+    assert parse_value('                   T') is True
+    assert parse_value('             1.5D2') == 150.0
+
+
+def test_table_header():
+    from astropy.io import fits
+    from protozfits import File
+
+    path = os.path.join(resources, 'example_LST_R1_10_evts.fits.fz')
+    with File(path) as f:
+        assert isinstance(f.Events.header, fits.Header)
+        assert f.Events.header['EXTNAME'] == 'Events'
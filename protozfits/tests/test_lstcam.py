@@ -0,0 +1,55 @@
+import pkg_resources
+import os
+import numpy as np
+import pytest
+
+example_file_path = pkg_resources.resource_filename(
+    'protozfits',
+    os.path.join(
+        'tests',
+        'resources',
+        'example_LST_R1_10_evts.fits.fz'
+    )
+)
+
+
+def test_decode_lstcam():
+    from protozfits import File, decode_lstcam
+
+    with File(example_file_path) as f:
+        decoded = decode_lstcam(f.Events)
+        events = list(f.Events)
+
+    assert decoded.shape == (10, )
+    assert decoded['first_capacitor_id'].shape == (10, 2, 8)
+    assert decoded['counters'].shape == (10, 2)
+    for row, event in zip(decoded, events):
+        assert row['event_id'] == event.event_id
+        assert (row['module_status'] == event.lstcam.module_status).all()
+        assert (
+            row['first_capacitor_id'].ravel()
+            == event.lstcam.first_capacitor_id
+        ).all()
+        assert (
+            row['drs_tag'].ravel() == event.lstcam.drs_tag
+        ).all()
+
+    # decoding converted events gives the same result
+    assert (decode_lstcam(events) == decoded).all()
+
+
+def test_unpack_counters():
+    from protozfits import File
+    from protozfits.lstcam import unpack_counters, DRAGON_COUNTERS_DTYPE
+
+    assert DRAGON_COUNTERS_DTYPE.itemsize == 22
+
+    with File(example_file_path) as f:
+        event = f.Events[0]
+    counters = unpack_counters(event.lstcam.counters)
+    assert counters.shape == (2, )
+    assert counters['event_counter'][1] == 1
+    assert counters['trigger_counter'][1] == 31
+
+    with pytest.raises(ValueError):
+        unpack_counters(np.zeros(21, dtype=np.uint8))
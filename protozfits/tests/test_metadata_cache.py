@@ -0,0 +1,54 @@
+import pkg_resources
+import os
+import shutil
+
+example_file_path = pkg_resources.resource_filename(
+    'protozfits',
+    os.path.join(
+        'tests',
+        'resources',
+        'example_LST_R1_10_evts.fits.fz'
+    )
+)
+
+
+def test_cache_roundtrip(tmpdir):
+    from protozfits import MetadataCache, detect_bintables
+
+    with MetadataCache(str(tmpdir.join('cache.sqlite'))) as cache:
+        assert cache.get(example_file_path) is None
+        descriptions = cache.detect_bintables(example_file_path)
+        assert descriptions == detect_bintables(example_file_path)
+        assert cache.get(example_file_path) == descriptions
+
+    # the cache persists
+    with MetadataCache(str(tmpdir.join('cache.sqlite'))) as cache:
+        assert cache.get(example_file_path) == descriptions
+
+
+def test_cache_detects_changed_files(tmpdir):
+    from protozfits import MetadataCache
+
+    path = str(tmpdir.join('copy.fits.fz'))
+    shutil.copy(example_file_path, path)
+    with MetadataCache(str(tmpdir.join('cache.sqlite'))) as cache:
+        cache.detect_bintables(path)
+        assert cache.get(path) is not None
+
+        with open(path, 'ab') as f:
+            f.write(b'\0' * 2880)
+        assert cache.get(path) is None
+
+
+def test_File_with_cache(tmpdir):
+    from protozfits import File, MetadataCache, MultiZFitsFiles
+
+    with MetadataCache(str(tmpdir.join('cache.sqlite'))) as cache:
+        for i in range(2):
+            with File(example_file_path, metadata_cache=cache) as f:
+                assert len(f.Events) == 10
+                assert f.Events.header['EXTNAME'] == 'Events'
+
+        paths = [example_file_path] * 8
+        multi = MultiZFitsFiles(paths, metadata_cache=cache)
+        assert sum(1 for e in multi) == 80
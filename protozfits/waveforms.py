@@ -0,0 +1,175 @@
+'''Waveforms as arrays shaped like the camera
+
+L0 `WaveFormData` and `IntegralData` only contain the pixels which
+survived the zero suppression, listed in `pixelsIndices`. The dense_*
+functions scatter them into arrays covering all pixels of the camera.
+They work on namedtuples as well as on plain protobuf messages.
+'''
+from operator import attrgetter
+
+import numpy as np
+
+from .CoreMessages_pb2 import AnyArray
+from .any_array_to_numpy import any_array_type_to_numpy_type
+from .batch import stack_events, to_numpy
+
+
+def dense_waveforms(
+    event, n_pixels, fill='baseline', gain='hiGain', out=None
+):
+    '''(n_pixels, n_samples) array of the waveforms of an L0 event
+
+    fill: value of the pixels without samples, 'baseline' uses the
+        baseline of each pixel, if the event has one for every pixel
+        (otherwise 0).
+    gain: 'hiGain' or 'loGain'
+    out: optional (n_pixels, n_samples) array to be filled, for an
+        event without samples it is only filled with `fill`
+    '''
+    waveforms = getattr(event, gain).waveforms
+    samples = to_numpy(waveforms.samples)
+    pixels = _pixels_indices(waveforms, n_pixels)
+    n_samples = waveforms.num_samples
+    if not n_samples:
+        n_samples = samples.size // len(pixels) if len(pixels) else 0
+    if out is not None and samples.size == 0:
+        n_samples = out.shape[-1]
+
+    if out is None:
+        out = np.empty(
+            (n_pixels, n_samples), dtype=_dtype(waveforms.samples, samples)
+        )
+    elif out.shape != (n_pixels, n_samples):
+        raise ValueError('out has shape {}, but the event has {}'.format(
+            out.shape, (n_pixels, n_samples)
+        ))
+
+    if isinstance(fill, str) and fill == 'baseline':
+        baselines = to_numpy(waveforms.baselines)
+        if baselines.size == n_pixels:
+            out[...] = baselines[:, np.newaxis]
+        else:
+            out[...] = 0
+    else:
+        out[...] = fill
+
+    if samples.size:
+        out[pixels] = samples.reshape(len(pixels), n_samples)
+    return out
+
+
+def dense_integrals(event, n_pixels, fill=0, gain='hiGain', out=None):
+    '''(n_pixels, ) array of the integrated charges of an L0 event
+
+    fill: value of the pixels without charge
+    gain: 'hiGain' or 'loGain'
+    out: optional (n_pixels, ) array to be filled
+    '''
+    integrals = getattr(event, gain).integrals
+    gains = to_numpy(integrals.gains)
+    pixels = _pixels_indices(integrals, n_pixels)
+
+    if out is None:
+        out = np.empty(n_pixels, dtype=_dtype(integrals.gains, gains))
+    out[...] = fill
+    if gains.size:
+        out[pixels] = gains
+    return out
+
+
+def stack_dense_waveforms(events, n_pixels, fill='baseline', gain='hiGain'):
+    '''dense waveforms of many events in one (n_events, n_pixels, n_samples)
+    array, see dense_waveforms.
+
+    events: a Table, whose rows are then read without converting them,
+        or a sequence of events.
+
+    The number of samples and the dtype are those of the first event
+    with samples.
+    '''
+    return _stack(
+        dense_waveforms, 'waveforms.samples', events, n_pixels, fill, gain,
+        empty=np.empty((0, n_pixels, 0)),
+    )
+
+
+def stack_dense_integrals(events, n_pixels, fill=0, gain='hiGain'):
+    '''dense integrals of many events in one (n_events, n_pixels) array,
+    see dense_integrals and stack_dense_waveforms.
+    '''
+    return _stack(
+        dense_integrals, 'integrals.gains', events, n_pixels, fill, gain,
+        empty=np.empty((0, n_pixels)),
+    )
+
+
+def reshape_waveform(waveform, n_pixels, n_samples):
+    '''view of a flat waveform as (n_gains, n_pixels, n_samples) array'''
+    return waveform.reshape(-1, n_pixels, n_samples)
+
+
+def pixel_order(expected_pixels_id):
+    '''indices sorting per pixel arrays by pixel id
+
+    expected_pixels_id: the pixel ids in the order in which the pixels
+        appear in the events, a permutation of 0..n_pixels-1
+    '''
+    expected_pixels_id = np.asarray(expected_pixels_id)
+    order = np.argsort(expected_pixels_id, kind='stable')
+    if (expected_pixels_id[order] != np.arange(len(order))).any():
+        raise ValueError(
+            'expected_pixels_id is not a permutation of the pixel ids'
+        )
+    return order
+
+
+def take_pixels(array, order, axis=0):
+    '''per pixel array sorted by pixel id, order comes from pixel_order'''
+    if array.size == 0:
+        return array
+    return np.take(array, order, axis=axis)
+
+
+def reorder_waveform(waveform, order, n_pixels, n_samples, reshape=False):
+    '''flat waveform sorted by pixel id, see pixel_order
+
+    reshape: return it as (n_gains, n_pixels, n_samples) array
+    '''
+    shaped = reshape_waveform(waveform, n_pixels, n_samples)
+    reordered = take_pixels(shaped, order, axis=1)
+    if reshape:
+        return reordered
+    return reordered.reshape(waveform.shape)
+
+
+def _stack(dense, values, events, n_pixels, fill, gain, empty):
+    get_values = attrgetter(gain + '.' + values)
+
+    def allocate(event, n_events):
+        first = dense(event, n_pixels, fill, gain)
+        return np.empty((n_events, ) + first.shape, dtype=first.dtype)
+
+    def fill_row(event, row):
+        dense(event, n_pixels, fill, gain, out=row)
+
+    # the first event with values determines shape and dtype
+    return stack_events(
+        events, allocate, fill_row,
+        empty=empty,
+        ready=lambda event: to_numpy(get_values(event)).size > 0,
+    )
+
+
+def _pixels_indices(data, n_pixels):
+    '''indices of the pixels in data, all pixels if there are none'''
+    pixels = to_numpy(data.pixelsIndices)
+    if pixels.size == 0:
+        return np.arange(n_pixels)
+    return pixels
+
+
+def _dtype(value, array):
+    '''dtype of value, for an AnyArray its type, even if it is empty'''
+    if isinstance(value, AnyArray):
+        return any_array_type_to_numpy_type.get(value.type, array.dtype)
+    return array.dtype